@@ -1,5 +1,40 @@
+import numpy as np
 import pygame
 from settings import SCREEN_HEIGHT
+from fonts import get_font, render_text
+from ring_buffer import RingBuffer
+
+
+def _x_coords(plot):
+    """Screen x of every sample slot of a plot, recomputed only when the plot moves or changes width."""
+    key = (plot.x, plot.width, plot.max_points)
+    if plot._x_key != key:
+        plot._x_key = key
+        plot._xs = plot.x + np.arange(plot.max_points) * (plot.width / plot.max_points)
+    return plot._xs
+
+
+def _draw_series(screen, plot, values, scale_y, color):
+    """
+    Draw a series of samples, oldest on the left, as one polyline.
+
+    When there are more samples than pixel columns, each column is reduced to
+    the lowest and highest sample falling into it, which draws the same
+    picture with at most two vertices per column.
+    """
+    if len(values) < 2:
+        return
+    xs = _x_coords(plot)[:len(values)]
+    columns = max(1, int(plot.width))
+    if len(values) > 2 * columns:
+        column = ((xs - plot.x) * (columns / plot.width)).astype(np.intp)
+        starts = np.flatnonzero(np.diff(column, prepend=-1))
+        xs = np.repeat(xs[starts], 2)
+        values = np.column_stack((np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts))).ravel()
+    points = np.empty((len(values), 2))
+    points[:, 0] = xs
+    points[:, 1] = plot.y + plot.height - values * scale_y
+    pygame.draw.lines(screen, color, False, points.tolist(), int(4 * plot.screen_height/SCREEN_HEIGHT))
 
 
 class LivePlot:
@@ -21,9 +56,11 @@ class LivePlot:
         self.height = height
         self.max_points = max_points
         self.min_y_scale = min_y_scale
-        self.data = []
-        self.max_speed = []
-        self.font = pygame.font.Font(None, int(25*screen_height/SCREEN_HEIGHT))  # Font for labels and ticks
+        self.data = RingBuffer(max_points)
+        self.max_speed = RingBuffer(max_points)
+        self._x_key = None  # (x, width, max_points) the cached x coordinates belong to
+        self._xs = None
+        self.font = get_font(None, int(25*screen_height/SCREEN_HEIGHT))  # Font for labels and ticks
         self.screen_height=screen_height
 
     def add_data(self, avg_velocity, max_speed):
@@ -34,9 +71,6 @@ class LivePlot:
             avg_velocity (float): The average velocity of the boids.
             max_speed (float): The current maximum speed of the boids.
         """
-        if len(self.data) >= self.max_points:
-            self.data.pop(0)
-            self.max_speed.pop(0)
         self.data.append(avg_velocity)
         self.max_speed.append(max_speed)
 
@@ -56,35 +90,22 @@ class LivePlot:
             return  # No data to plot
 
         # Normalize data for plotting
-        max_y = max(self.min_y_scale, max(self.data + self.max_speed) * 1.1)  # Dynamic scaling with a minimum threshold
-        scale_x = self.width / self.max_points
+        max_y = max(self.min_y_scale, max(self.data.max(), self.max_speed.max()) * 1.1)  # Dynamic scaling with a minimum threshold
         scale_y = self.height / max_y
 
-        # Plot average velocity
-        for i in range(len(self.data) - 1):
-            x1 = self.x + i * scale_x
-            y1 = self.y + self.height - self.data[i] * scale_y
-            x2 = self.x + (i + 1) * scale_x
-            y2 = self.y + self.height - self.data[i + 1] * scale_y
-            pygame.draw.line(screen, (255, 0, 0), (x1, y1), (x2, y2), int(4 * self.screen_height/SCREEN_HEIGHT))
-
-        # Plot max speed line
-        for i in range(len(self.max_speed) - 1):
-            x1 = self.x + i * scale_x
-            y1 = self.y + self.height - self.max_speed[i] * scale_y
-            x2 = self.x + (i + 1) * scale_x
-            y2 = self.y + self.height - self.max_speed[i + 1] * scale_y
-            pygame.draw.line(screen, (0, 0, 255), (x1, y1), (x2, y2), int(4 * self.screen_height/SCREEN_HEIGHT))
+        # Plot average velocity and max speed lines
+        _draw_series(screen, self, self.data.values(), scale_y, (255, 0, 0))
+        _draw_series(screen, self, self.max_speed.values(), scale_y, (0, 0, 255))
 
         # Add axis labels
-        y_label = self.font.render("Velocity", True, (0, 0, 0))
+        y_label = render_text(self.font, "Velocity", (0, 0, 0))
         # screen.blit(y_label, (self.x - y_label.get_width() - 10, self.y + self.height // 2 - y_label.get_height() // 2))
-        y_label_surface_rotated = pygame.transform.rotate(y_label, 90)  # Rotate text 90 degrees
+        y_label_surface_rotated = render_text(self.font, "Velocity", (0, 0, 0), angle=90)  # Rotate text 90 degrees
         y_label_rect = y_label_surface_rotated.get_rect(center=(self.x - y_label_surface_rotated.get_height() // 2 - 15, self.y + self.height // 2))
         screen.blit(y_label_surface_rotated, y_label_rect)
         # Add legend
-        avg_legend = self.font.render("Avg Velocity", True, (255, 0, 0))
-        max_speed_legend = self.font.render("Max Speed", True, (0, 0, 255))
+        avg_legend = render_text(self.font, "Avg Velocity", (255, 0, 0))
+        max_speed_legend = render_text(self.font, "Max Speed", (0, 0, 255))
         screen.blit(avg_legend, (1.02*self.x, self.y - self.height/8))
         screen.blit(max_speed_legend, (self.x + 1*self.width/2, self.y - self.height/8))
 
@@ -94,24 +115,32 @@ class LivePlot:
             # Y ticks
             y_tick_value = max_y / num_ticks * i
             y_tick_y = self.y + self.height - (y_tick_value * scale_y)
-            y_tick_label = self.font.render(f"{y_tick_value:.1f}", True, (0, 0, 0))
+            y_tick_label = render_text(self.font, f"{y_tick_value:.1f}", (0, 0, 0))
             screen.blit(y_tick_label, (self.x - y_tick_label.get_width() - 5, y_tick_y - y_tick_label.get_height() // 2))
         # Print current average velocity
         if self.data:
-            avg_text = f"Avg Velocity ~ {self.data[-1]:.2f}"
+            avg_text = f"Avg Velocity ~ {self.data.last():.2f}"
             avg_surface = self.font.render(avg_text, True, (0, 0, 0))
             screen.blit(avg_surface, (self.x + self.width // 2 - avg_surface.get_width() // 2, self.y + self.height + 10))
 
     def _update_font(self):
         """Update the font size dynamically based on screen height."""
         font_size = int(25 * self.screen_height / SCREEN_HEIGHT)
-        self.font = pygame.font.Font(None, max(10, font_size))  # Ensure minimum font size of 10
+        self.font = get_font(None, max(10, font_size))  # Ensure minimum font size of 10
 
     def set_screen_height(self, screen_height):
         """Update the screen height and recalculate font size."""
         self.screen_height = screen_height
         self._update_font()
 
+    def reposition(self, x, y, width, height, screen_height):
+        """Move and resize the plot for a new window size, keeping the plotted history."""
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.set_screen_height(screen_height)
+
 
 import pygame
 
@@ -134,9 +163,11 @@ class LivePlotNeighbours:
         self.height = height
         self.max_points = max_points
         self.min_y_scale = min_y_scale
-        self.data = []
-        self.max_neighbours = []
-        self.font = pygame.font.Font(None, int(25*screen_height/SCREEN_HEIGHT))  # Font for labels and ticks
+        self.data = RingBuffer(max_points)
+        self.max_neighbours = RingBuffer(max_points)
+        self._x_key = None  # (x, width, max_points) the cached x coordinates belong to
+        self._xs = None
+        self.font = get_font(None, int(25*screen_height/SCREEN_HEIGHT))  # Font for labels and ticks
         self.screen_height=screen_height
 
     def add_data(self, avg_neighbours, max_neighbours):
@@ -147,9 +178,6 @@ class LivePlotNeighbours:
             avg_neighbours (float): The average number of neighbors of the boids.
             max_neighbours (int): The maximum possible neighbors (num_boids - 1).
         """
-        if len(self.data) >= self.max_points:
-            self.data.pop(0)
-            self.max_neighbours.pop(0)
         self.data.append(avg_neighbours)
         self.max_neighbours.append(max_neighbours)
 
@@ -169,36 +197,23 @@ class LivePlotNeighbours:
             return  # No data to plot
 
         # Normalize data for plotting
-        max_y = max(self.min_y_scale, max(self.data + self.max_neighbours) * 1.1)  # Dynamic scaling with a minimum threshold
-        scale_x = self.width / self.max_points
+        max_y = max(self.min_y_scale, max(self.data.max(), self.max_neighbours.max()) * 1.1)  # Dynamic scaling with a minimum threshold
         scale_y = self.height / max_y
 
-        # Plot average neighbors
-        for i in range(len(self.data) - 1):
-            x1 = self.x + i * scale_x
-            y1 = self.y + self.height - self.data[i] * scale_y
-            x2 = self.x + (i + 1) * scale_x
-            y2 = self.y + self.height - self.data[i + 1] * scale_y
-            pygame.draw.line(screen, (0, 200, 0), (x1, y1), (x2, y2), int(4 * self.screen_height/SCREEN_HEIGHT))
-
-        # Plot max neighbors line
-        for i in range(len(self.max_neighbours) - 1):
-            x1 = self.x + i * scale_x
-            y1 = self.y + self.height - self.max_neighbours[i] * scale_y
-            x2 = self.x + (i + 1) * scale_x
-            y2 = self.y + self.height - self.max_neighbours[i + 1] * scale_y
-            pygame.draw.line(screen, (0, 0, 255), (x1, y1), (x2, y2), int(4 * self.screen_height/SCREEN_HEIGHT))
+        # Plot average neighbors and max neighbors lines
+        _draw_series(screen, self, self.data.values(), scale_y, (0, 200, 0))
+        _draw_series(screen, self, self.max_neighbours.values(), scale_y, (0, 0, 255))
 
         # Add axis labels
-        y_label = self.font.render("Neighbors", True, (0, 0, 0))
+        y_label = render_text(self.font, "Neighbors", (0, 0, 0))
         # screen.blit(y_label, (self.x - y_label.get_width() - 10, self.y + self.height // 2 - y_label.get_height() // 2))
-        y_label_surface_rotated = pygame.transform.rotate(y_label, 90)  # Rotate text 90 degrees
+        y_label_surface_rotated = render_text(self.font, "Neighbors", (0, 0, 0), angle=90)  # Rotate text 90 degrees
         y_label_rect = y_label_surface_rotated.get_rect(center=(self.x - y_label_surface_rotated.get_height() // 2 - 15, self.y + self.height // 2))
         screen.blit(y_label_surface_rotated, y_label_rect)
 
         # Add legend
-        avg_legend = self.font.render("Avg Neighbors", True, (0, 200, 0))
-        max_neighbours_legend = self.font.render("Max Neighbors", True, (0, 0, 255))
+        avg_legend = render_text(self.font, "Avg Neighbors", (0, 200, 0))
+        max_neighbours_legend = render_text(self.font, "Max Neighbors", (0, 0, 255))
         screen.blit(avg_legend, (1.02*self.x, self.y - self.height/8))
         screen.blit(max_neighbours_legend, (self.x + 1*self.width/2, self.y - self.height/8))
 
@@ -208,21 +223,29 @@ class LivePlotNeighbours:
             # Y ticks
             y_tick_value = max_y / num_ticks * i
             y_tick_y = self.y + self.height - (y_tick_value * scale_y)
-            y_tick_label = self.font.render(f"{y_tick_value:.1f}", True, (0, 0, 0))
+            y_tick_label = render_text(self.font, f"{y_tick_value:.1f}", (0, 0, 0))
             screen.blit(y_tick_label, (self.x - y_tick_label.get_width() - 5, y_tick_y - y_tick_label.get_height() // 2))
 
         # Print current average neighbors
         if self.data:
-            avg_text = f"Avg Neighbors ~ {self.data[-1]:.2f}"
+            avg_text = f"Avg Neighbors ~ {self.data.last():.2f}"
             avg_surface = self.font.render(avg_text, True, (0, 0, 0))
             screen.blit(avg_surface, (self.x + self.width // 2 - avg_surface.get_width() // 2, self.y + self.height + 10))
 
     def _update_font(self):
         """Update the font size dynamically based on screen height."""
         font_size = int(25 * self.screen_height / SCREEN_HEIGHT)
-        self.font = pygame.font.Font(None, max(10, font_size))  # Ensure minimum font size of 10
+        self.font = get_font(None, max(10, font_size))  # Ensure minimum font size of 10
 
     def set_screen_height(self, screen_height):
         """Update the screen height and recalculate font size."""
         self.screen_height = screen_height
-        self._update_font()
\ No newline at end of file
+        self._update_font()
+
+    def reposition(self, x, y, width, height, screen_height):
+        """Move and resize the plot for a new window size, keeping the plotted history."""
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.set_screen_height(screen_height)
@@ -0,0 +1,146 @@
+"""
+Benchmark flock stepping throughput across flock sizes, radii and seeds.
+
+Example:
+    python benchmark.py --sizes 100 1000 10000 --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pygame
+from flock import VectorFlock
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, DEFAULTS
+
+
+def benchmark_case(num_boids, perception_radius, seed, steps, warmup=2, draw=False,
+                   width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+    """
+    Time apply_rules + update (and optionally draw) for one configuration.
+
+    Returns:
+        dict: The configuration, steps per second, boid updates per second and
+            the peak memory traced during one extra step. Tracing slows
+            allocations down, so it is kept out of the timed steps.
+    """
+    flock = VectorFlock(num_boids, width, height, seed=seed)
+    surface = pygame.Surface((width, height)) if draw else None
+    weights = (DEFAULTS["separation"], DEFAULTS["alignment"], DEFAULTS["cohesion"])
+    max_speed = DEFAULTS["max_speed"]
+
+    def step():
+        flock.apply_rules(*weights, perception_radius, max_speed)
+        flock.update(max_speed)
+        if surface is not None:
+            flock.draw(surface)
+
+    for _ in range(warmup):
+        step()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    step()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "boids": num_boids,
+        "perception_radius": perception_radius,
+        "seed": seed,
+        "draw": draw,
+        "steps": steps,
+        "seconds": seconds,
+        "steps_per_second": steps / seconds,
+        "boid_updates_per_second": steps * num_boids / seconds,
+        "peak_memory_bytes": peak,
+    }
+
+
+def _case_key(case):
+    return (case["boids"], case["perception_radius"], case["seed"], case["draw"])
+
+
+def compare(results, baseline, threshold):
+    """
+    Find the cases that got slower than in an earlier run.
+
+    Args:
+        results (list): Cases from this run.
+        baseline (list): Cases from the earlier run.
+        threshold (float): Allowed relative slowdown, e.g. 0.1 for 10%.
+
+    Returns:
+        list: (case, baseline steps per second, relative change) of every regression.
+    """
+    previous = {_case_key(case): case for case in baseline}
+    regressions = []
+    for case in results:
+        old = previous.get(_case_key(case))
+        if old is None:
+            continue
+        change = case["steps_per_second"] / old["steps_per_second"] - 1
+        if change < -threshold:
+            regressions.append((case, old["steps_per_second"], change))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark flock step throughput.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000], help="Flock sizes.")
+    parser.add_argument("--radii", type=float, nargs="+", default=[25.0, 50.0], help="Perception radii.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Seeds of the initial states.")
+    parser.add_argument("--steps", type=int, default=20, help="Timed steps per case.")
+    parser.add_argument("--draw", action="store_true", help="Also draw onto an offscreen Surface every step.")
+    parser.add_argument("--output", default="bench_output.json", help="File the results are written to.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier results file to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown counted as a regression.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = []
+    for num_boids in args.sizes:
+        for radius in args.radii:
+            for seed in args.seeds:
+                case = benchmark_case(num_boids, radius, seed, args.steps, draw=args.draw)
+                results.append(case)
+                print(f"{num_boids:>7} boids  r={radius:<6g} seed={seed:<4} "
+                      f"{case['steps_per_second']:10.1f} steps/s  "
+                      f"{case['boid_updates_per_second']:12.0f} boid updates/s  "
+                      f"{case['peak_memory_bytes'] / 2**20:8.1f} MiB peak")
+
+    report = {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for case, old_rate, change in regressions:
+            print(f"REGRESSION {case['boids']} boids r={case['perception_radius']:g} seed={case['seed']}: "
+                  f"{old_rate:.1f} -> {case['steps_per_second']:.1f} steps/s ({change:+.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
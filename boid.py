@@ -2,21 +2,25 @@ import random
 import pygame
 import numpy as np
 from settings import SCREEN_HEIGHT
+from sprites import get_sprite
 
 class Boid:
-    def __init__(self, screen_width, screen_height):
+    def __init__(self, screen_width, screen_height, rng=random):
+        """rng is the random number source, the global random module by default."""
         self.screen_width = screen_width
         self.screen_height = screen_height
-        self.position = pygame.math.Vector2(random.uniform(0, self.screen_width), random.uniform(0, self.screen_height))
-        angle = random.uniform(0, 360)
-        self.velocity = pygame.math.Vector2(1, 0).rotate(angle) * random.uniform(1.5, 4)
+        self.position = pygame.math.Vector2(rng.uniform(0, self.screen_width), rng.uniform(0, self.screen_height))
+        angle = rng.uniform(0, 360)
+        self.velocity = pygame.math.Vector2(1, 0).rotate(angle) * rng.uniform(1.5, 4)
         self.acceleration = pygame.math.Vector2(0, 0)
         self.max_speed = 4
         self.max_force = 0.1
 
-        # Load and scale the sprite image
-        self.image = pygame.image.load("bird.png")
-        self.image = pygame.transform.scale(self.image, (20* self.screen_height/SCREEN_HEIGHT, 20* self.screen_height/SCREEN_HEIGHT))  # Resize the image
+        self.original_image = None  # Sprite is loaded on the first draw, so headless runs never touch it
+
+    def _load_image(self):
+        """Fetch the scaled sprite image from the shared cache."""
+        self.image = get_sprite(self.screen_height)
         self.original_image = self.image  # Keep an unrotated copy
 
     def limits(self):
@@ -76,9 +80,13 @@ class Boid:
             steering.scale_to_length(self.max_force)
         return steering
 
-    def behaviour(self, flock, separation_weight, alignment_weight, cohesion_weight, radius, maxspeed):
-        """Combine separation, alignment, and cohesion forces."""
-        neighbours = self.get_neighbours(flock, radius)
+    def behaviour(self, flock, separation_weight, alignment_weight, cohesion_weight, radius, maxspeed, neighbours=None):
+        """Combine separation, alignment, and cohesion forces.
+
+        neighbours can be passed in when they were already computed for this tick.
+        """
+        if neighbours is None:
+            neighbours = self.get_neighbours(flock, radius)
         self.acceleration = pygame.math.Vector2(0, 0)
 
         separation_force = self.separation(neighbours, maxspeed) * separation_weight
@@ -101,6 +109,8 @@ class Boid:
         self.limits()
 
     def draw(self, screen):
+        if self.original_image is None:
+            self._load_image()
         # Calculate the angle of the boid's velocity vector
         angle = np.degrees(np.arctan2(self.velocity[1], self.velocity[0]))
         rotated_image = pygame.transform.rotate(self.original_image, 320-angle)  # Rotate the image
@@ -0,0 +1,143 @@
+"""
+Save and restore the complete state of a VectorFlock.
+
+A checkpoint is an uncompressed .npz archive holding the position, velocity
+and acceleration arrays of boids and predators, the bit generator state, the
+last rule parameters, the predator settings, the world size, the periodic
+flag and the tick. A flock restored from it
+continues along the same trajectory, bit for bit, as the one that was saved.
+"""
+import json
+import os
+import threading
+import numpy as np
+from flock import VectorFlock
+
+FORMAT_VERSION = 1
+
+
+def snapshot(flock):
+    """
+    Copy everything needed to continue a flock into a dict of arrays.
+
+    Copying the arrays is the only work done on the caller's thread, so a
+    snapshot can be written out while the flock keeps moving.
+    """
+    meta = {
+        "version": FORMAT_VERSION,
+        "tick": flock.tick,
+        "world_size": [flock.screen_width, flock.screen_height],
+        "periodic": flock.periodic,
+        "max_force": flock.max_force,
+        "seed": flock.seed,
+        "parameters": flock.parameters,
+        "rng": flock.rng.bit_generator.state,
+        "predators": {
+            "count": flock.num_predators,
+            "fear_radius": flock.fear_radius,
+            "chase_radius": flock.chase_radius,
+            "speed_ratio": flock.predator_speed_ratio,
+            "flee_weight": flock.flee_weight,
+        },
+    }
+    return {
+        "positions": flock.positions.copy(),
+        "velocities": flock.velocities.copy(),
+        "accelerations": flock.accelerations.copy(),
+        "meta": np.array(json.dumps(meta)),
+    }
+
+
+def write_snapshot(state, path):
+    """Write a snapshot to path, replacing any earlier checkpoint only once it is complete."""
+    partial = path + ".partial"
+    with open(partial, "wb") as f:
+        np.savez(f, **state)
+    os.replace(partial, path)
+
+
+def save_checkpoint(flock, path):
+    """Write a checkpoint of flock to path."""
+    write_snapshot(snapshot(flock), path)
+
+
+def load_checkpoint(path, profiler=None):
+    """
+    Rebuild a flock from a checkpoint.
+
+    Args:
+        path (str): Checkpoint written by save_checkpoint or CheckpointWriter.
+        profiler (Profiler): Optional profiler for the restored flock.
+
+    Returns:
+        VectorFlock: The flock as it was when the checkpoint was taken.
+    """
+    return restore_checkpoint(VectorFlock(0, 1, 1, profiler=profiler), path)
+
+
+def restore_checkpoint(flock, path):
+    """
+    Overwrite the state of an existing flock, e.g. a ParallelVectorFlock, with a checkpoint.
+
+    Returns:
+        VectorFlock: flock, now as it was when the checkpoint was taken.
+    """
+    with np.load(path) as archive:
+        meta = json.loads(archive["meta"].item())
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path} has checkpoint format {meta['version']}, expected {FORMAT_VERSION}")
+        flock.positions = archive["positions"]
+        flock.velocities = archive["velocities"]
+        flock.accelerations = archive["accelerations"]
+    flock.screen_width, flock.screen_height = meta["world_size"]
+    flock.periodic = meta["periodic"]
+    flock.max_force = meta["max_force"]
+    flock.seed = meta["seed"]
+    flock.tick = meta["tick"]
+    flock.parameters = meta["parameters"]
+    predators = meta.get("predators", {"count": 0})  # Checkpoints from before predators existed have none
+    flock.num_predators = predators["count"]
+    flock.fear_radius = predators.get("fear_radius", flock.fear_radius)
+    flock.chase_radius = predators.get("chase_radius", flock.chase_radius)
+    flock.predator_speed_ratio = predators.get("speed_ratio", flock.predator_speed_ratio)
+    flock.flee_weight = predators.get("flee_weight", flock.flee_weight)
+    flock.rng = np.random.default_rng()
+    flock.rng.bit_generator.state = meta["rng"]
+    flock.invalidate_neighbours()
+    return flock
+
+
+class CheckpointWriter:
+    """
+    Write checkpoints from a background thread.
+
+    save() takes the snapshot right away and returns while the file is
+    written. Only one write is in flight: saving again before the previous
+    checkpoint is on disk waits for it first.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._error = None
+
+    def save(self, flock, path):
+        """Snapshot flock now and write it to path in the background."""
+        state = snapshot(flock)
+        self.wait()
+        self._thread = threading.Thread(target=self._write, args=(state, path), name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def _write(self, state, path):
+        try:
+            write_snapshot(state, path)
+        except OSError as error:
+            self._error = error
+
+    def wait(self):
+        """Block until the last checkpoint is written, raising any error the write hit."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
@@ -1,25 +1,534 @@
+import random
 import numpy as np
+import pygame
 from boid import Boid
+from spatial_grid import SpatialGrid, NeighbourSets, pair_offsets
+from settings import (
+    SCREEN_HEIGHT, PAIR_CHUNK, PREDATOR_FEAR_RADIUS, PREDATOR_CHASE_RADIUS, PREDATOR_SPEED_RATIO, FLEE_WEIGHT,
+)
+from sprites import get_atlas, sprite_size
+from profiler import Profiler
 
 class Flock:
-    def __init__(self, num_boids, screen_width, screen_height):
-        self.boids = [Boid(screen_width, screen_height) for _ in range(num_boids)]
+    def __init__(self, num_boids, screen_width, screen_height, seed=None):
+        # A private generator, so runs with the same seed start identically
+        rng = random.Random(seed)
+        self.boids = [Boid(screen_width, screen_height, rng=rng) for _ in range(num_boids)]
+        self._neighbours = None  # (radius, neighbour lists) cached until boids move
+
+    def __len__(self):
+        return len(self.boids)
+
+    def neighbours(self, radius):
+        """Return the neighbour list of every boid, computed once per tick and radius."""
+        if self._neighbours is None or self._neighbours[0] != radius:
+            self._neighbours = (radius, [boid.get_neighbours(self.boids, radius) for boid in self.boids])
+        return self._neighbours[1]
+
+    @property
+    def world_size(self):
+        """Always None: boids measure plain distances, see Boid.get_neighbours."""
+        return None
+
+    def neighbour_pairs(self, radius):
+        """Return index arrays (i, j) of every boid j within radius of boid i."""
+        index = {id(boid): k for k, boid in enumerate(self.boids)}
+        neighbours = self.neighbours(radius)
+        i = np.repeat(np.arange(len(self.boids)), [len(found) for found in neighbours])
+        j = np.array([index[id(other)] for found in neighbours for other in found], dtype=np.intp)
+        return i, j
+
+    def neighbour_counts(self, radius):
+        """Return the number of neighbours of every boid within radius."""
+        return np.array([len(neighbours) for neighbours in self.neighbours(radius)], dtype=np.intp)
 
     def apply_rules(self, separation_weight, alignment_weight, cohesion_weight, perception_radius, maxspeed):
-        for boid in self.boids:
+        for boid, neighbours in zip(self.boids, self.neighbours(perception_radius)):
             boid.behaviour(
                 self.boids,
                 separation_weight=separation_weight,
                 alignment_weight=alignment_weight,
                 cohesion_weight=cohesion_weight,
                 radius=perception_radius,
-                maxspeed=maxspeed
+                maxspeed=maxspeed,
+                neighbours=neighbours
             )
 
     def update(self, max_speed):
         for boid in self.boids:
             boid.update(max_speed)
+        self._neighbours = None
 
     def draw(self, screen):
         for boid in self.boids:
-            boid.draw(screen)
\ No newline at end of file
+            boid.draw(screen)
+
+
+def draw_flock(screen, positions, velocities, screen_height, num_predators=0, return_rects=False):
+    """
+    Draw a flock state that need not belong to a live flock, e.g. a published frame.
+
+    Args:
+        screen (pygame.Surface): The surface to draw on.
+        positions (np.ndarray): (N + P, 2) positions, the predators last.
+        velocities (np.ndarray): (N + P, 2) velocities orienting the sprites.
+        screen_height (float): Height of the world, which sets the sprite size.
+        num_predators (int): Number of predator rows at the end of the arrays.
+        return_rects (bool): Return the rectangle of every boid.
+
+    Returns:
+        list: The screen rectangle of every boid and predator when return_rects is True, else None.
+    """
+    n = len(positions) - num_predators
+    rects = get_atlas(screen_height).draw(screen, positions[:n], velocities[:n], return_rects)
+    if num_predators:
+        predator_rects = draw_predators(screen, positions[n:], velocities[n:], screen_height)
+        if return_rects:
+            rects.extend(predator_rects)
+    return rects
+
+
+def draw_perception_radius(screen, position, radius, screen_height):
+    """Draw a perception radius around position and return the rectangle it covers."""
+    return pygame.draw.circle(screen, (255, 0, 0), tuple(position), radius, int(4 * screen_height / SCREEN_HEIGHT))
+
+
+def draw_predators(screen, positions, velocities, screen_height):
+    """
+    Draw predators as red arrowheads pointing along their velocity.
+
+    Returns:
+        list: The screen rectangle of every predator.
+    """
+    size = 0.75 * sprite_size(screen_height)
+    speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+    headings = np.where(speeds[:, None] > 0, velocities / np.maximum(speeds, 1e-12)[:, None], (1.0, 0.0))
+    normals = np.column_stack((-headings[:, 1], headings[:, 0]))
+    tips = positions + headings * size
+    left = positions - headings * size * 0.6 + normals * size * 0.6
+    right = positions - headings * size * 0.6 - normals * size * 0.6
+    return [
+        pygame.draw.polygon(screen, (200, 0, 0), points)
+        for points in zip(tips.tolist(), left.tolist(), positions.tolist(), right.tolist())
+    ]
+
+
+def _clamp_length(vectors, max_length):
+    """Scale down (in place) every row of an (N, 2) array longer than max_length."""
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    too_long = lengths > max_length
+    vectors[too_long] *= (max_length / lengths[too_long])[:, None]
+    return vectors
+
+
+def _steer_towards(vectors, velocities, max_speed, max_force):
+    """Batched version of Boid._steer_towards for (N, 2) arrays."""
+    if max_speed <= 0:
+        max_speed = 0.1  # Ensure max_speed is not zero or negative
+
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    nonzero = lengths > 0
+    desired = vectors.copy()
+    desired[nonzero] *= (max_speed / lengths[nonzero])[:, None]
+    return _clamp_length(desired - velocities, max_force)
+
+
+def _flocking_forces(positions, velocities, neighbours, weights, max_speed, max_force, world_size=None,
+                     chunk_size=PAIR_CHUNK, boids=None):
+    """
+    Compute the combined separation, alignment and cohesion acceleration.
+
+    Args:
+        positions (np.ndarray): (N, 2) boid positions.
+        velocities (np.ndarray): (N, 2) boid velocities.
+        neighbours (NeighbourSets): Neighbours of every boid.
+        weights (tuple): Separation, alignment and cohesion weights.
+        max_speed (float): Desired speed used when steering.
+        max_force (float): Maximum length of each steering force.
+        world_size (tuple): (width, height) when offsets wrap around the screen.
+        chunk_size (int): Neighbour pairs processed at once, bounding the
+            temporary buffers.
+        boids (np.ndarray): Boid index of every row of neighbours, when the
+            sets only cover a subset of the flock. By default row k is boid k.
+
+    Returns:
+        np.ndarray: (len(neighbours), 2) accelerations, zero for boids without neighbours.
+    """
+    if boids is None:
+        boids = np.arange(len(neighbours))
+    accelerations = np.zeros((len(neighbours), 2))
+    rows, indices = neighbours.pairs()
+    for start, stop in neighbours.chunks(chunk_size):
+        first, last = neighbours.indptr[start], neighbours.indptr[stop]
+        accelerations[start:stop] = _chunk_forces(
+            positions, velocities, rows[first:last] - start, boids[start:stop], indices[first:last],
+            neighbours.counts[start:stop], weights, max_speed, max_force, world_size,
+        )
+    return accelerations
+
+
+def _chunk_forces(positions, velocities, local, own, j, counts, weights, max_speed, max_force, world_size):
+    """Accelerations of the boids own, whose pairs are (own[local], j)."""
+    n = len(counts)
+    accelerations = np.zeros((n, 2))
+    has_neighbours = counts > 0
+    if not has_neighbours.any():
+        return accelerations
+
+    offsets = pair_offsets(positions, own[local], j, world_size)  # From the boid towards its neighbour
+    dist_sq = offsets[:, 0] ** 2 + offsets[:, 1] ** 2
+    # Separation pushes away from each neighbour, weighted inversely to distance
+    away = np.zeros_like(offsets)
+    apart = dist_sq > 0  # Avoid division by zero
+    away[apart] = -offsets[apart] / dist_sq[apart, None]
+
+    def mean_over_neighbours(values):
+        sums = np.column_stack((
+            np.bincount(local, weights=values[:, 0], minlength=n),
+            np.bincount(local, weights=values[:, 1], minlength=n),
+        ))
+        return sums[has_neighbours] / counts[has_neighbours, None]
+
+    own_velocities = velocities[own][has_neighbours]
+    separation_weight, alignment_weight, cohesion_weight = weights
+    separation = _steer_towards(mean_over_neighbours(away), own_velocities, max_speed, max_force)
+    alignment = _steer_towards(mean_over_neighbours(velocities[j]), own_velocities, max_speed, max_force)
+    cohesion = _steer_towards(mean_over_neighbours(offsets), own_velocities, max_speed, max_force)
+
+    accelerations[has_neighbours] = (
+        separation * separation_weight
+        + alignment * alignment_weight
+        + cohesion * cohesion_weight
+    )
+    return accelerations
+
+
+def _predator_forces(positions, velocities, num_boids, grid, fear_radius, chase_radius, weights, max_speed,
+                     max_force, world_size=None):
+    """
+    Compute the flee force on boids near a predator and the chase force of every predator.
+
+    The predators are the rows after the first num_boids. Their neighbourhoods
+    are looked up from the predators' side only, in a grid holding the boids,
+    so the cost grows with the number of predators and the boids around
+    them, not with the size of the flock.
+
+    Args:
+        positions (np.ndarray): (N + P, 2) positions, boids first.
+        velocities (np.ndarray): (N + P, 2) velocities.
+        num_boids (int): N, the number of boids before the predators.
+        grid (SpatialGrid): Grid rebuilt with the boid positions, with cells at
+            least max(fear_radius, chase_radius) wide.
+        fear_radius (float): Boids closer than this to a predator flee from it.
+        chase_radius (float): Predators steer towards the nearest boid within this distance.
+        weights (tuple): Flee weight, and predator speed as a multiple of max_speed.
+        max_speed (float): Maximum speed of the boids.
+        max_force (float): Maximum length of each steering force.
+        world_size (tuple): (width, height) when offsets wrap around the screen.
+
+    Returns:
+        tuple: (boids, flee) the boids fleeing and their (len(boids), 2) flee
+            accelerations, and (predators, chase) likewise for the predators
+            with a boid in sight.
+    """
+    flee_weight, speed_ratio = weights
+    predators = np.arange(num_boids, len(positions))
+    i, j = grid.neighbour_pairs(positions, max(fear_radius, chase_radius), world_size is not None, queries=predators)
+    offsets = pair_offsets(positions, i, j, world_size)  # From the predator towards the boid
+    dist_sq = offsets[:, 0] ** 2 + offsets[:, 1] ** 2
+
+    # Fleeing boids steer away from every predator close to them, weighted inversely to distance
+    scared = (dist_sq < fear_radius ** 2) & (dist_sq > 0)
+    fleeing = np.unique(j[scared])
+    local = np.searchsorted(fleeing, j[scared])
+    away = offsets[scared] / dist_sq[scared, None]
+    sums = np.column_stack((
+        np.bincount(local, weights=away[:, 0], minlength=len(fleeing)),
+        np.bincount(local, weights=away[:, 1], minlength=len(fleeing)),
+    )).astype(float, copy=False)  # bincount returns ints when no boid is scared
+    flee = _steer_towards(sums, velocities[fleeing], max_speed, max_force) * flee_weight
+
+    # Predators steer towards the nearest boid in sight
+    in_sight = np.flatnonzero(dist_sq < chase_radius ** 2)
+    nearest = np.full(len(predators), np.inf)
+    np.minimum.at(nearest, i[in_sight] - num_boids, dist_sq[in_sight])
+    closest = in_sight[dist_sq[in_sight] == nearest[i[in_sight] - num_boids]]
+    hunters, first = np.unique(i[closest], return_index=True)
+    chase = _steer_towards(offsets[closest[first]], velocities[hunters], max_speed * speed_ratio, max_force)
+    return fleeing, flee, hunters, chase
+
+
+class VectorFlock:
+    """
+    Struct-of-arrays flock engine.
+
+    Holds every boid's position, velocity and acceleration in contiguous
+    (N, 2) float arrays and applies the same rules as Boid/Flock with
+    batched NumPy operations instead of a Python loop per boid.
+
+    Neighbours are looked up in a SpatialGrid whose cells are one perception
+    radius wide. With periodic=True distances are measured across the wrapped
+    screen edges; by default they are plain distances, as in Boid.get_neighbours.
+
+    The neighbour search, rules, update and draw stages are timed in the given
+    Profiler, if any.
+
+    All randomness comes from a NumPy Generator created from seed, so two
+    flocks built with the same seed and stepped with the same parameters
+    follow bit-identical trajectories.
+
+    num_predators predators live in the same arrays, in the rows after the
+    boids. They chase the nearest boid within chase_radius, and boids within
+    fear_radius of a predator flee from it; they take no part in the
+    flocking rules or the statistics. len() counts the boids only.
+
+    Boids and predators steer around the obstacles of an ObstacleField (see
+    obstacles.py) set with set_obstacles.
+
+    Memory use per boid is bounded: 48 bytes of state (three (N, 2) float64
+    arrays), 8 bytes for its slot in the grid, 16 bytes of neighbour counts
+    and offsets, plus 8 bytes per neighbour in the cached NeighbourSets
+    (16 while they are being assembled).
+    Temporary buffers of the neighbour search and the rules are processed in
+    chunks of PAIR_CHUNK pairs, so they add a fixed amount (about 30 MB)
+    whatever the flock size.
+    """
+
+    def __init__(self, num_boids, screen_width, screen_height, periodic=False, profiler=None, seed=None,
+                 num_predators=0):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.periodic = periodic
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.max_force = 0.1
+        self.grid = None  # Created on the first neighbour query
+        self._neighbours = None  # (radius, NeighbourSets) cached until boids move
+        self.tick = 0  # Number of update() calls so far
+        self.parameters = None  # Arguments of the last apply_rules call, kept for checkpoints
+        self.num_predators = 0
+        self.fear_radius = PREDATOR_FEAR_RADIUS
+        self.chase_radius = PREDATOR_CHASE_RADIUS
+        self.predator_speed_ratio = PREDATOR_SPEED_RATIO
+        self.flee_weight = FLEE_WEIGHT
+        self._predator_grid = None  # Created on the first predator query
+        self.obstacles = None  # ObstacleField, if any
+
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.positions, self.velocities = self._random_boids(num_boids)
+        self.accelerations = np.zeros((num_boids, 2))
+        self.set_predators(num_predators)
+
+    def __len__(self):
+        return len(self.positions) - self.num_predators
+
+    def resize(self, num_boids):
+        """
+        Change the number of boids in place.
+
+        Extra boids are dropped from the end of the boids; new boids are
+        drawn from the flock's generator and appended after the last one.
+        The predators stay as they are.
+        """
+        current = len(self)
+        if num_boids < current:
+            self.positions = np.concatenate((self.positions[:num_boids], self.positions[current:]))
+            self.velocities = np.concatenate((self.velocities[:num_boids], self.velocities[current:]))
+            self.accelerations = np.concatenate((self.accelerations[:num_boids], self.accelerations[current:]))
+        elif num_boids > current:
+            positions, velocities = self._random_boids(num_boids - current)
+            self.positions = np.concatenate((self.positions[:current], positions, self.positions[current:]))
+            self.velocities = np.concatenate((self.velocities[:current], velocities, self.velocities[current:]))
+            self.accelerations = np.concatenate((
+                self.accelerations[:current], np.zeros((num_boids - current, 2)), self.accelerations[current:],
+            ))
+        self.invalidate_neighbours()
+
+    def set_predators(self, num_predators):
+        """
+        Change the number of predators in place.
+
+        Extra predators are dropped from the end of the arrays; new ones are
+        placed and headed at random like new boids.
+        """
+        total = len(self) + num_predators
+        if total < len(self.positions):
+            self.positions = self.positions[:total].copy()
+            self.velocities = self.velocities[:total].copy()
+            self.accelerations = self.accelerations[:total].copy()
+        elif total > len(self.positions):
+            extra = total - len(self.positions)
+            positions, velocities = self._random_boids(extra)
+            self.positions = np.concatenate((self.positions, positions))
+            self.velocities = np.concatenate((self.velocities, velocities))
+            self.accelerations = np.concatenate((self.accelerations, np.zeros((extra, 2))))
+        self.num_predators = num_predators
+
+    def _random_boids(self, count):
+        """Draw positions and velocities of new boids, distributed as in Boid.__init__."""
+        positions = self.rng.uniform((0, 0), (self.screen_width, self.screen_height), size=(count, 2))
+        angles = np.radians(self.rng.uniform(0, 360, count))
+        speeds = self.rng.uniform(1.5, 4, count)
+        velocities = np.column_stack((np.cos(angles), np.sin(angles))) * speeds[:, None]
+        return positions, velocities
+
+    def set_world_size(self, width, height, rescale=True):
+        """
+        Change the world bounds in place, e.g. when the window is resized.
+
+        Args:
+            width (float): New world width.
+            height (float): New world height.
+            rescale (bool): Stretch the positions with the world, so the flock
+                keeps its layout. Otherwise boids outside the new bounds are
+                wrapped back in.
+        """
+        if rescale:
+            self.positions *= (width / self.screen_width, height / self.screen_height)
+        self.screen_width = width
+        self.screen_height = height
+        np.mod(self.positions, (width, height), out=self.positions)
+        if self.obstacles is not None:
+            self.obstacles.set_world_size(width, height, rescale)
+        self.invalidate_neighbours()
+
+    def set_obstacles(self, field):
+        """Avoid the obstacles of an ObstacleField over this world from the next apply_rules on, or none with None."""
+        self.obstacles = field
+
+    @property
+    def world_size(self):
+        """(width, height) used to wrap offsets, or None for plain distances."""
+        return (self.screen_width, self.screen_height) if self.periodic else None
+
+    def neighbours(self, radius):
+        """
+        Return the NeighbourSets of every boid within radius.
+
+        The result is cached and shared by apply_rules and the statistics, so
+        the search runs once per tick. It is recomputed only after the boids
+        move or when a different radius is asked for.
+        """
+        if self._neighbours is not None and self._neighbours[0] == radius:
+            return self._neighbours[1]
+        n = len(self)
+        if radius <= 0 or n == 0:
+            empty = np.empty(0, dtype=np.intp)
+            sets = NeighbourSets(empty, empty, n)
+        else:
+            with self.profiler.scope("neighbours"):
+                if self.grid is None:
+                    self.grid = SpatialGrid(self.screen_width, self.screen_height, radius)
+                else:
+                    self.grid.configure(self.screen_width, self.screen_height, radius)
+                boids = self.positions[:n]
+                self.grid.rebuild(boids)
+                i, j = self.grid.neighbour_pairs(boids, radius, self.periodic)
+                sets = NeighbourSets(i, j, n)
+        self._neighbours = (radius, sets)
+        return sets
+
+    def invalidate_neighbours(self):
+        """Drop the cached neighbour sets after positions were changed directly."""
+        self._neighbours = None
+
+    def neighbour_pairs(self, radius):
+        """Return index arrays (i, j) of every boid j within radius of boid i."""
+        return self.neighbours(radius).pairs()
+
+    def neighbour_counts(self, radius):
+        """Return the number of neighbours of every boid within radius."""
+        return self.neighbours(radius).counts
+
+    def apply_rules(self, separation_weight, alignment_weight, cohesion_weight, perception_radius, maxspeed):
+        self.parameters = {
+            "separation": separation_weight,
+            "alignment": alignment_weight,
+            "cohesion": cohesion_weight,
+            "perception_radius": perception_radius,
+            "max_speed": maxspeed,
+        }
+        neighbours = self.neighbours(perception_radius)
+        with self.profiler.scope("rules"):
+            accelerations = _flocking_forces(
+                self.positions,
+                self.velocities,
+                neighbours,
+                (separation_weight, alignment_weight, cohesion_weight),
+                maxspeed,
+                self.max_force,
+                self.world_size,
+            )
+        if self.num_predators:
+            accelerations = np.concatenate((accelerations, np.zeros((self.num_predators, 2))))
+            self.add_predator_forces(accelerations, maxspeed)
+        self.add_obstacle_forces(accelerations, maxspeed)
+        self.accelerations = accelerations
+
+    def add_predator_forces(self, accelerations, max_speed):
+        """
+        Add the flee force to the boids near a predator and set the chase force of the predators.
+
+        Args:
+            accelerations (np.ndarray): (N + P, 2) accelerations from the
+                flocking rules, updated in place. Predator rows are overwritten.
+            max_speed (float): Maximum speed of the boids.
+        """
+        n = len(self)
+        accelerations[n:] = 0
+        if n == 0 or self.num_predators == 0:
+            return
+        with self.profiler.scope("predators"):
+            reach = max(self.fear_radius, self.chase_radius)
+            if self._predator_grid is None:
+                self._predator_grid = SpatialGrid(self.screen_width, self.screen_height, reach)
+            else:
+                self._predator_grid.configure(self.screen_width, self.screen_height, reach)
+            self._predator_grid.rebuild(self.positions[:n])
+            fleeing, flee, hunters, chase = _predator_forces(
+                self.positions, self.velocities, n, self._predator_grid, self.fear_radius, self.chase_radius,
+                (self.flee_weight, self.predator_speed_ratio), max_speed, self.max_force, self.world_size,
+            )
+            accelerations[fleeing] += flee
+            accelerations[hunters] = chase
+
+    def add_obstacle_forces(self, accelerations, max_speed):
+        """Add the obstacle avoidance force of every boid and predator to accelerations, in place."""
+        if not self.obstacles:
+            return
+        with self.profiler.scope("obstacles"):
+            accelerations += self.obstacles.forces(self.positions, self.velocities, max_speed, self.max_force)
+
+    def update(self, max_speed):
+        """Update all velocities and positions and wrap around the screen."""
+        if max_speed <= 0:
+            max_speed = 0.1  # Ensure max_speed is not zero or negative
+
+        with self.profiler.scope("update"):
+            self.velocities += self.accelerations
+            n = len(self)
+            _clamp_length(self.velocities[:n], max_speed)
+            _clamp_length(self.velocities[n:], max_speed * self.predator_speed_ratio)
+            self.positions += self.velocities
+            np.mod(self.positions, (self.screen_width, self.screen_height), out=self.positions)
+        self.tick += 1
+        self.invalidate_neighbours()
+
+    def draw(self, screen, return_rects=False):
+        """
+        Draw every boid with one batched blit of pre-rotated sprites, and the predators as red arrowheads.
+
+        Args:
+            screen (pygame.Surface): The surface to draw on.
+            return_rects (bool): Return the rectangle of every boid.
+
+        Returns:
+            list: The screen rectangle of every boid and predator when return_rects is True, else None.
+        """
+        with self.profiler.scope("draw"):
+            return draw_flock(screen, self.positions, self.velocities, self.screen_height,
+                              num_predators=self.num_predators, return_rects=return_rects)
+
+    def draw_perception_radius(self, screen, radius, index=0):
+        """Draw the perception radius of one boid and return the rectangle it covers."""
+        return draw_perception_radius(screen, self.positions[index], radius, self.screen_height)
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+import pygame
+
+TEXT_CACHE_SIZE = 512  # Rendered strings kept before the least recently used is dropped
+
+_fonts = {}  # (face, size) -> pygame.font.Font
+_text_surfaces = OrderedDict()  # (text, font, color, angle) -> rendered pygame.Surface
+
+
+def get_font(face, size):
+    """
+    Return the shared Font for a face and size, loading it only once.
+
+    Args:
+        face (str): Font file name, or None for pygame's default font.
+        size (int): Font size in points.
+
+    Returns:
+        pygame.font.Font: The shared font object.
+    """
+    key = (face, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(face, size)
+    return font
+
+
+def render_text(font, text, color, angle=0):
+    """
+    Render antialiased text, reusing the surface if it was rendered recently.
+
+    Static labels therefore cost a blit instead of a glyph rasterization.
+    The cache holds the TEXT_CACHE_SIZE most recently used strings.
+
+    Args:
+        font (pygame.font.Font): Font from get_font.
+        text (str): The text to render.
+        color (tuple): RGB color of the text.
+        angle (float): Counterclockwise rotation in degrees.
+
+    Returns:
+        pygame.Surface: The shared surface. Callers must not draw onto it.
+    """
+    key = (text, font, tuple(color), angle)
+    surface = _text_surfaces.get(key)
+    if surface is not None:
+        _text_surfaces.move_to_end(key)
+        return surface
+    surface = font.render(text, True, color)
+    if angle:
+        surface = pygame.transform.rotate(surface, angle)
+    _text_surfaces[key] = surface
+    if len(_text_surfaces) > TEXT_CACHE_SIZE:
+        _text_surfaces.popitem(last=False)
+    return surface
@@ -0,0 +1,240 @@
+"""
+Run the boids simulation without a display, as fast as the CPU allows.
+
+Example:
+    python -m headless run --boids 5000 --steps 10000 --seed 1 --output run.json
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import sys
+import time
+from flock import Flock, VectorFlock
+from parallel import ParallelVectorFlock
+from metrics import Metrics, collect
+from recorder import TrajectoryRecorder
+from checkpoint import CheckpointWriter, restore_checkpoint
+from obstacles import ObstacleField, Circle, Mask
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, DEFAULTS
+
+ENGINES = {"vector": VectorFlock, "parallel": ParallelVectorFlock, "reference": Flock}
+
+
+def summarize(flock, perception_radius):
+    """
+    Compute summary metrics of the current flock state.
+
+    Args:
+        flock (Flock | VectorFlock): The flock to measure.
+        perception_radius (float): Radius used to count neighbours.
+
+    Returns:
+        dict: The value of every collector in metrics.COLLECTORS, e.g. mean
+            speed, polarization (1 when all boids fly the same way) and mean
+            neighbour count.
+    """
+    return collect(flock, perception_radius)
+
+
+def run_simulation(num_boids, steps, seed=None, separation=DEFAULTS["separation"], alignment=DEFAULTS["alignment"],
+                   cohesion=DEFAULTS["cohesion"], max_speed=DEFAULTS["max_speed"],
+                   perception_radius=DEFAULTS["perception_radius"], width=SCREEN_WIDTH, height=SCREEN_HEIGHT,
+                   engine="vector", periodic=False, metrics_interval=0, metrics_output=None,
+                   record=None, record_every=1, checkpoint=None, checkpoint_every=0, resume=None, workers=None,
+                   num_predators=0, obstacles=()):
+    """
+    Advance a flock for a number of steps without drawing anything.
+
+    With metrics_interval > 0 the flock is also sampled every that many steps
+    and the samples are streamed to metrics_output, if given. With record set,
+    the initial state and every record_every-th step are written to that
+    trajectory file (see recorder.py).
+
+    The parallel engine evaluates the rules in workers processes (all CPUs
+    by default), see parallel.py. num_predators predators (vector and
+    parallel engines) chase the boids, which flee from them; they are left
+    out of the metrics and the recorded trajectory. obstacles (Circle,
+    Polygon or Mask from obstacles.py; vector and parallel engines) are
+    avoided by boids and predators. They are not part of checkpoints, so a
+    resumed run needs them again.
+
+    With checkpoint set (vector and parallel engines), the complete flock
+    state is written there every checkpoint_every steps and at the end of the
+    run. With resume, the flock continues from that checkpoint: its boids,
+    world, seed and rule parameters replace the corresponding arguments, and
+    steps more steps are run.
+
+    Returns:
+        dict: The run parameters, timing and the summarize() metrics of the final
+            state. With metrics_interval > 0 also "series": the tick of every
+            sample and the sampled values of every collector.
+    """
+    if resume:
+        if engine == "parallel":
+            flock = restore_checkpoint(ParallelVectorFlock(0, width, height, workers=workers), resume)
+        else:
+            flock = restore_checkpoint(VectorFlock(0, width, height), resume)
+        num_boids, seed, periodic = len(flock), flock.seed, flock.periodic
+        num_predators = flock.num_predators
+        width, height = flock.screen_width, flock.screen_height
+        if flock.parameters is not None:
+            separation = flock.parameters["separation"]
+            alignment = flock.parameters["alignment"]
+            cohesion = flock.parameters["cohesion"]
+            perception_radius = flock.parameters["perception_radius"]
+            max_speed = flock.parameters["max_speed"]
+    elif engine == "parallel":
+        flock = ParallelVectorFlock(num_boids, width, height, workers=workers, periodic=periodic, seed=seed,
+                                    num_predators=num_predators)
+    elif engine == "vector":
+        flock = VectorFlock(num_boids, width, height, periodic=periodic, seed=seed, num_predators=num_predators)
+    else:
+        flock = Flock(num_boids, width, height, seed=seed)
+
+    if obstacles:
+        flock.set_obstacles(ObstacleField(width, height, obstacles))
+
+    parameters = {
+        "boids": num_boids,
+        "predators": num_predators,
+        "obstacles": len(obstacles),
+        "steps": steps,
+        "seed": seed,
+        "separation": separation,
+        "alignment": alignment,
+        "cohesion": cohesion,
+        "max_speed": max_speed,
+        "perception_radius": perception_radius,
+        "width": width,
+        "height": height,
+        "engine": engine,
+        "periodic": periodic,
+        "metrics_interval": metrics_interval,
+        "resumed_from": resume,
+        "start_tick": getattr(flock, "tick", 0),
+    }
+    capacity = max(1, steps // metrics_interval) if metrics_interval > 0 else 1
+    metrics = Metrics(interval=metrics_interval, capacity=capacity, path=metrics_output).register_defaults()
+    recorder = None
+    if record:
+        recorder = TrajectoryRecorder(record, num_boids, dt=record_every, world_size=(width, height),
+                                      parameters=parameters)
+    writer = CheckpointWriter() if checkpoint else None
+    start = time.perf_counter()
+    try:
+        for step in range(1, steps + 1):
+            if recorder is not None:
+                recorder.record(flock)
+            flock.apply_rules(separation, alignment, cohesion, perception_radius, max_speed)
+            flock.update(max_speed)
+            metrics.step(flock, perception_radius)
+            if writer is not None and (step == steps or checkpoint_every > 0 and step % checkpoint_every == 0):
+                writer.save(flock, checkpoint)
+    finally:
+        metrics.close()
+        if recorder is not None:
+            recorder.close()
+        if writer is not None:
+            writer.wait()
+        if isinstance(flock, ParallelVectorFlock):
+            flock.close()
+    seconds = time.perf_counter() - start
+
+    result = {
+        "parameters": parameters,
+        "seconds": seconds,
+        "steps_per_second": steps / seconds if seconds > 0 else float("inf"),
+        "metrics": summarize(flock, perception_radius),
+    }
+    if metrics_interval > 0:
+        result["series"] = {"tick": metrics.ticks.values().astype(int).tolist()}
+        result["series"].update({name: metrics.values(name).tolist() for name in metrics.collectors})
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m headless", description="Headless boids simulation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Simulate a flock and write summary metrics.")
+    run.add_argument("--boids", type=int, default=DEFAULTS["number_boids"], help="Number of boids.")
+    run.add_argument("--predators", type=int, default=0, help="Number of predators hunting the boids.")
+    run.add_argument("--obstacle", nargs=3, type=float, action="append", default=[], metavar=("X", "Y", "R"),
+                     help="Add a circular obstacle (repeatable).")
+    run.add_argument("--obstacle-image", metavar="PATH",
+                     help="Block the dark pixels of an image, stretched over the world.")
+    run.add_argument("--steps", type=int, default=1000, help="Number of simulation steps.")
+    run.add_argument("--seed", type=int, default=None, help="Random seed for the initial state.")
+    run.add_argument("--separation", type=float, default=DEFAULTS["separation"], help="Separation weight.")
+    run.add_argument("--alignment", type=float, default=DEFAULTS["alignment"], help="Alignment weight.")
+    run.add_argument("--cohesion", type=float, default=DEFAULTS["cohesion"], help="Cohesion weight.")
+    run.add_argument("--max-speed", type=float, default=DEFAULTS["max_speed"], help="Maximum boid speed.")
+    run.add_argument("--radius", type=float, default=DEFAULTS["perception_radius"], help="Perception radius.")
+    run.add_argument("--width", type=float, default=SCREEN_WIDTH, help="World width.")
+    run.add_argument("--height", type=float, default=SCREEN_HEIGHT, help="World height.")
+    run.add_argument("--engine", choices=sorted(ENGINES), default="vector", help="Flock implementation to run.")
+    run.add_argument("--workers", type=int, default=None,
+                     help="Worker processes of the parallel engine (defaults to the number of CPUs).")
+    run.add_argument("--periodic", action="store_true", help="Find neighbours across the wrapped screen edges.")
+    run.add_argument("--metrics-interval", type=int, default=0, metavar="K",
+                     help="Sample the order parameters every K steps (0 disables sampling).")
+    run.add_argument("--metrics-output", metavar="PATH",
+                     help="Stream the sampled order parameters to a .csv file, or JSON lines otherwise.")
+    run.add_argument("--record", metavar="PATH", help="Write the trajectory to this file (see recorder.py).")
+    run.add_argument("--record-every", type=int, default=1, metavar="K", help="Record every K-th step.")
+    run.add_argument("--checkpoint", metavar="PATH", help="Save the flock state here at the end of the run.")
+    run.add_argument("--checkpoint-every", type=int, default=0, metavar="K",
+                     help="Also save the checkpoint every K steps during the run.")
+    run.add_argument("--resume", metavar="PATH",
+                     help="Continue from a checkpoint, with its boids, world and rule parameters, for --steps more steps.")
+    run.add_argument("--output", help="Write the summary JSON here instead of stdout.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    obstacles = [Circle(x, y, r) for x, y, r in args.obstacle]
+    if args.obstacle_image:
+        obstacles.append(Mask.from_image(args.obstacle_image))
+    if args.engine == "reference" and (args.periodic or args.checkpoint or args.resume or args.predators or obstacles):
+        print("--periodic, --checkpoint, --resume, --predators and obstacles are not supported by the reference engine",
+              file=sys.stderr)
+        return 2
+
+    result = run_simulation(
+        args.boids,
+        args.steps,
+        seed=args.seed,
+        separation=args.separation,
+        alignment=args.alignment,
+        cohesion=args.cohesion,
+        max_speed=args.max_speed,
+        perception_radius=args.radius,
+        width=args.width,
+        height=args.height,
+        engine=args.engine,
+        periodic=args.periodic,
+        metrics_interval=args.metrics_interval,
+        metrics_output=args.metrics_output,
+        record=args.record,
+        record_every=args.record_every,
+        checkpoint=args.checkpoint,
+        checkpoint_every=args.checkpoint_every,
+        resume=args.resume,
+        workers=args.workers,
+        num_predators=args.predators,
+        obstacles=obstacles,
+    )
+    summary = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(summary + "\n")
+    else:
+        print(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
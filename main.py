@@ -1,66 +1,122 @@
-from flock import Flock
-from settings import SCREEN_WIDTH, SCREEN_HEIGHT, NUM_BOIDS, DEFAULTS
-from ui import Panel, DigitInputBox, TextUI, SemiCirclePanel, Button, IntegerInputBox
+from flock import VectorFlock, draw_flock, draw_perception_radius
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, NUM_BOIDS, MAX_BOIDS, DEFAULTS, OBSTACLE_RADIUS
+from ui import Panel, DigitInputBox, TextUI, SemiCirclePanel, Button, IntegerInputBox, StaticLayer
+import argparse
+import time
 import pygame
 from LivePlot import LivePlot, LivePlotNeighbours
+from sprites import clear_sprite_cache
+from profiler import Profiler
+from metrics import Metrics, COLLECTORS
+from recorder import TrajectoryRecorder
+from scheduler import interpolate, MIN_SPEED, MAX_SPEED
+from simulation import SimulationThread
+from obstacles import ObstacleField, Circle, Mask
+from fonts import get_font, render_text
 bg = pygame.image.load("stockimage_sky.jpg")
 
+# Beyond this many changed rectangles a full-screen flip is cheaper than a partial update
+DIRTY_RECT_LIMIT = 500
+# Quiet time after the last resize event before the layout is redone for the new window size
+RESIZE_SETTLE_SECONDS = 0.15
+
+
+def scale_background(screen_width, screen_height):
+    """Scale the sky image to the window once and convert it to the display format."""
+    return pygame.transform.smoothscale(bg, (screen_width, screen_height)).convert()
+
+def ui_geometry(screen_width, screen_height):
+    """Position and size of every widget for a window size, as keyword arguments of its reposition method."""
+    panel_height = 2*screen_height / 3
+    label_font = int(20*screen_height/SCREEN_HEIGHT)
+
+    def input_box(row):
+        return dict(x=1 * screen_width / 7, y=row*screen_height/9, width=screen_width/12, height=screen_height/20,
+                    screen_width=screen_width, screen_height=screen_height)
+
+    def label(x, row, font_size=label_font):
+        return dict(x=x * screen_width / 5, y=row*screen_height/9, font_size=font_size)
+
+    def button(x, width):
+        return dict(x=x*screen_width, y=panel_height-0.1*screen_height, width=width*screen_width, height=0.05*screen_height,
+                    font_size=int(30 * screen_height/SCREEN_HEIGHT), screen_width=screen_width, screen_height=screen_height)
+
+    return {
+        "panel": dict(x=0, y=0, width=screen_width, height=panel_height),
+        "sub_panel": dict(x=3.2* screen_width/5, y=0.1*screen_height, width=1.7*screen_width/5, height=screen_height / 3),
+        "separation_input": input_box(0.3),
+        "alignment_input": input_box(1.3),
+        "cohesion_input": input_box(2.3),
+        "max_speed_input": input_box(3.3),
+        "perception_radius_input": input_box(4.3),
+        "instructions_label": dict(x=3.64 * screen_width/5, y=0.04 * screen_height, font_size=int(25*screen_height/SCREEN_HEIGHT)),
+        "separation_label": label(0.1, 0.4),
+        "alignment_label": label(0.1, 1.4),
+        "cohesion_label": label(0.1, 2.4),
+        "max_speed_label": label(0.1, 3.4),
+        "perception_label": label(0.1, 4.3),
+        "radius_label": label(0.16, 4.53),
+        "total_label": label(0.16, 5.3),
+        "boids_label": label(0.16, 5.53),
+        "menu_panel": dict(x=screen_width // 2, y=0, radius=3*screen_width/37, screen_height=screen_height),
+        "reset_button": button(0.65, 0.1),
+        "perception_circle_button": button(0.8, 0.16),
+        "boid_count_input": input_box(5.3),
+    }
+
+
+def plot_geometry(screen_width, screen_height):
+    """Position and size of the velocity and neighbour plots, as keyword arguments of LivePlot.reposition."""
+    velocity = dict(x=1.8*screen_width/5, y=0.5*screen_height/9, width=screen_width/4, height=screen_height/5, screen_height=screen_height)
+    neighbours = dict(velocity, y=velocity["y"]+1.7*velocity["height"])
+    return velocity, neighbours
+
+
 def update_ui_layout(screen_width, screen_height):
-    panel = Panel(0, 0, screen_width, 2*screen_height / 3, color=(255,255,255))
-    sub_panel = Panel(3.2* screen_width/5, 0.1*screen_height, 1.7*screen_width/5, screen_height / 3, color=(255,255,255), border_color=(0,0,0), border_width=3)
-    separation_input = DigitInputBox(1 * screen_width / 7, 0.3*screen_height/9, screen_width/12, screen_height/20, initial_value=1.00, screen_width=screen_width, screen_height=screen_height)
-    alignment_input = DigitInputBox(1 * screen_width / 7, 1.3*screen_height/9, screen_width/12, screen_height/20, initial_value=1.00, screen_width=screen_width, screen_height=screen_height)
-    cohesion_input = DigitInputBox(1 * screen_width / 7, 2.3*screen_height/9, screen_width/12, screen_height/20, initial_value=1.00, screen_width=screen_width, screen_height=screen_height)
-    max_speed_input = DigitInputBox(1 * screen_width / 7, 3.3*screen_height/9, screen_width/12, screen_height/20, initial_value=5.00, min_value=0.10, max_value=99.99, screen_width=screen_width, screen_height=screen_height)
-    perception_radius_input = DigitInputBox(1 * screen_width / 7, 4.3*screen_height/9, screen_width/12, screen_height/20, initial_value=50.00, min_value=1.00, max_value=99.99, screen_width=screen_width, screen_height=screen_height)
-    
-    instructions_label = TextUI("INSTRUCTIONS", 3.64 * screen_width/5, 0.04 * screen_height, font_size=int(25*screen_height/SCREEN_HEIGHT))
-    separation_label = TextUI("Separation:", 0.1 * screen_width / 5, 0.4*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))
-    alignment_label = TextUI("Alignment:", 0.1 * screen_width / 5, 1.4*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))
-    cohesion_label = TextUI("Cohesion:", 0.1 * screen_width / 5, 2.4*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))
-    max_speed_label = TextUI("Max Speed:", 0.1 * screen_width / 5, 3.4*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))
-    perception_label = TextUI("Perception", 0.1 * screen_width / 5, 4.3*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))
-    radius_label = TextUI("Radius:", 0.16 * screen_width / 5, 4.53*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))
-    total_label = TextUI("Total", 0.16 * screen_width / 5, 5.3*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))   
-    boids_label = TextUI("Boids:", 0.16 * screen_width / 5, 5.53*screen_height/9, font_size=int(20*screen_height/SCREEN_HEIGHT))
-    menu_panel = SemiCirclePanel(x=screen_width // 2, y=0, radius=3*screen_width/37, color=(200, 0, 0))
+    geometry = ui_geometry(screen_width, screen_height)
+    panel = Panel(**geometry["panel"], color=(255,255,255))
+    sub_panel = Panel(**geometry["sub_panel"], color=(255,255,255), border_color=(0,0,0), border_width=3)
+    separation_input = DigitInputBox(**geometry["separation_input"], initial_value=1.00)
+    alignment_input = DigitInputBox(**geometry["alignment_input"], initial_value=1.00)
+    cohesion_input = DigitInputBox(**geometry["cohesion_input"], initial_value=1.00)
+    max_speed_input = DigitInputBox(**geometry["max_speed_input"], initial_value=5.00, min_value=0.10, max_value=99.99)
+    perception_radius_input = DigitInputBox(**geometry["perception_radius_input"], initial_value=50.00, min_value=1.00, max_value=99.99)
+
+    instructions_label = TextUI("INSTRUCTIONS", **geometry["instructions_label"])
+    separation_label = TextUI("Separation:", **geometry["separation_label"])
+    alignment_label = TextUI("Alignment:", **geometry["alignment_label"])
+    cohesion_label = TextUI("Cohesion:", **geometry["cohesion_label"])
+    max_speed_label = TextUI("Max Speed:", **geometry["max_speed_label"])
+    perception_label = TextUI("Perception", **geometry["perception_label"])
+    radius_label = TextUI("Radius:", **geometry["radius_label"])
+    total_label = TextUI("Total", **geometry["total_label"])
+    boids_label = TextUI("Boids:", **geometry["boids_label"])
+    menu_panel = SemiCirclePanel(**geometry["menu_panel"], color=(200, 0, 0))
 
     reset_button = Button(
-    x=0.65*screen_width,  
-    y=panel.height-0.1*screen_height,  
-    width=0.1*screen_width,
-    height=0.05*screen_height,
+    **geometry["reset_button"],
     text="Reset",
-    font_size=int(30 * screen_height/SCREEN_HEIGHT),
     tooltip_text=" Reset the simulation",
-    screen_width=screen_width,
-    screen_height=screen_height
     )
 
     perception_circle_button = Button(
-    x=0.8*screen_width,
-    y=panel.height-0.1*screen_height,
-    width=0.16*screen_width, 
-    height=0.05*screen_height,
+    **geometry["perception_circle_button"],
     text="Show Perception",
-    font_size=int(30 * screen_height/SCREEN_HEIGHT),
     tooltip_text="Show the perception range of a boid",
-    screen_width=screen_width,
-    screen_height=screen_height
     )
     
     boid_count_input = IntegerInputBox(
-    x=1 * screen_width / 7,
-    y=5.3*screen_height/9,
-    width=screen_width/12,
-    height=screen_height/20,
+    **geometry["boid_count_input"],
     initial_value=100,
     min_value=1,
-    max_value=300,
-    screen_width=screen_width,
-    screen_height=screen_height
+    max_value=MAX_BOIDS,
     )
     
+    # Panels and labels never change between frames, so they are drawn once
+    static_layer = StaticLayer(panel.rect, [
+        panel, sub_panel, separation_label, alignment_label, cohesion_label, max_speed_label,
+        perception_label, radius_label, total_label, boids_label, instructions_label,
+    ])
 
     return {
         "panel": panel,
@@ -82,165 +138,299 @@ def update_ui_layout(screen_width, screen_height):
         "menu_panel": menu_panel,
         "reset_button": reset_button,
         "perception_circle_button": perception_circle_button,
-        "boid_count_input": boid_count_input
+        "boid_count_input": boid_count_input,
+        "static_layer": static_layer
     }
 
 
+def reposition_ui(ui_elements, screen_width, screen_height):
+    """Move every widget to its place in a resized window, keeping typed values and state."""
+    for name, geometry in ui_geometry(screen_width, screen_height).items():
+        ui_elements[name].reposition(**geometry)
+    ui_elements["static_layer"].reposition(ui_elements["panel"].rect)
+
+
+def read_parameters(ui_elements):
+    """Current rule parameters typed into the input boxes, as apply_rules keyword arguments."""
+    return {
+        "separation": ui_elements["separation_input"].get_value(),
+        "alignment": ui_elements["alignment_input"].get_value(),
+        "cohesion": ui_elements["cohesion_input"].get_value(),
+        "perception_radius": ui_elements["perception_radius_input"].get_value(),
+        "max_speed": ui_elements["max_speed_input"].get_value(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Boids simulation.")
+    parser.add_argument("--profile", action="store_true", help="Show the per-stage timing overlay (toggle with F3).")
+    parser.add_argument("--profile-dump", metavar="PATH", help="Write the per-stage timings to a .csv or .json file at exit.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed of the flock, for reproducible runs.")
+    parser.add_argument("--metrics-interval", type=int, default=1, metavar="K",
+                        help="Sample the flock statistics every K simulation steps (0 disables them and the plots).")
+    parser.add_argument("--metrics-output", metavar="PATH",
+                        help="Stream every flock statistic to a .csv file, or JSON lines otherwise.")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Record the trajectory to this file while the boid count and window size stay unchanged.")
+    parser.add_argument("--record-every", type=int, default=1, metavar="K", help="Record every K-th simulation step.")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help=f"Simulated time per real time, {MIN_SPEED:g} to {MAX_SPEED:g} (change with [ and ] while running).")
+    parser.add_argument("--predators", type=int, default=0,
+                        help="Number of predators hunting the flock (P adds one while running, Shift+P removes one).")
+    parser.add_argument("--obstacle", nargs=3, type=float, action="append", default=[], metavar=("X", "Y", "R"),
+                        help="Add a circular obstacle (repeatable). Right click adds one while running, C removes them all.")
+    parser.add_argument("--obstacle-image", metavar="PATH",
+                        help="Block the dark pixels of an image, stretched over the window.")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="Only repaint and update the screen areas that changed instead of flipping the whole window.")
+    return parser.parse_args(argv)
+
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Boids Simulation")
     clock = pygame.time.Clock()
+    profiler = Profiler()
+    background = scale_background(SCREEN_WIDTH, SCREEN_HEIGHT)
+    metrics = Metrics(interval=args.metrics_interval, path=args.metrics_output)
+    if args.metrics_output:
+        metrics.register_defaults()
+    else:
+        # Only what the live plots show
+        metrics.register("mean_speed", COLLECTORS["mean_speed"])
+        metrics.register("mean_neighbours", COLLECTORS["mean_neighbours"])
 
     # Initialize flock and UI components
     screen_width, screen_height = SCREEN_WIDTH, SCREEN_HEIGHT
-    flock = Flock(NUM_BOIDS, screen_width, screen_height)
+    num_predators = max(0, args.predators)
+    flock = VectorFlock(NUM_BOIDS, screen_width, screen_height, profiler=profiler, seed=args.seed,
+                        num_predators=num_predators)
+    obstacle_field = ObstacleField(screen_width, screen_height, [Circle(x, y, r) for x, y, r in args.obstacle])
+    if args.obstacle_image:
+        obstacle_field.add(Mask.from_image(args.obstacle_image))
+    flock.set_obstacles(obstacle_field.copy())  # The simulation thread works on its own copy
     ui_elements = update_ui_layout(screen_width, screen_height)
+    recorder = None
+    if args.record:
+        recorder = TrajectoryRecorder(args.record, len(flock), dt=args.record_every,
+                                      world_size=(screen_width, screen_height), parameters={"seed": args.seed})
 
-    # Initialize live plot
-    live_plot = LivePlot(x=1.8*screen_width/5, y=0.5*screen_height/9, width=screen_width/4, height=screen_height/5, max_points=100,min_y_scale=1)
-    # Initialize live plot for neighbors
-    live_plot_neighbors = LivePlotNeighbours(x=live_plot.x, y=live_plot.y+1.7*live_plot.height, width=screen_width/4, height=screen_height/5, max_points=100, min_y_scale=3
-                                         )
+    # Initialize live plots of velocity and neighbors
+    velocity_geometry, neighbour_geometry = plot_geometry(screen_width, screen_height)
+    live_plot = LivePlot(**velocity_geometry, max_points=100, min_y_scale=1)
+    live_plot_neighbors = LivePlotNeighbours(**neighbour_geometry, max_points=100, min_y_scale=3)
     running = True
     hideUI = True
     show_radius = False
+    show_profile = args.profile
+    # Screen areas drawn over in the previous frame, None when the whole screen must be redrawn
+    previous_rects = None
+    pending_size = None  # Window size of the last resize event, until the layout follows it
+    resize_due = 0
+    speed_font = get_font(None, 24)
+
+    # From here on the flock is stepped by the worker thread and only read through published frames
+    parameters = read_parameters(ui_elements)
+    num_boids = len(flock)
+    simulation = SimulationThread(flock, parameters, metrics=metrics,
+                                  recorder=recorder, speed=min(max(args.speed, MIN_SPEED), MAX_SPEED))
+    simulation.start()
+
+    try:
+        while running:
+            frame_start = time.perf_counter()
+            with profiler.scope("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.VIDEORESIZE:
+                        # Dragging a window edge sends a stream of these, the layout is redone once it settles
+                        pending_size = (event.w, event.h)
+                        resize_due = time.perf_counter() + RESIZE_SETTLE_SECONDS
+                    
+                    if event.type == pygame.MOUSEBUTTONDOWN:
+                        if ui_elements["menu_panel"].is_clicked(event.pos):  # Detect click on semicircle
+                            hideUI = not hideUI
+                        elif event.button == 3:
+                            obstacle_field.add(Circle(*event.pos, OBSTACLE_RADIUS * screen_height / SCREEN_HEIGHT))
+                            simulation.set_obstacles(obstacle_field.copy())
+                    if event.type == pygame.KEYUP:
+                        # if event.key == pygame.K_BACKSPACE:
+                        #     backSpace = True
+                        if (event.key == pygame.K_m or event.key == pygame.K_SPACE) or event.key == pygame.K_ESCAPE:
+                            hideUI = not hideUI
+                        if event.key == pygame.K_F3:
+                            show_profile = not show_profile
+                        if event.key == pygame.K_RIGHTBRACKET:
+                            simulation.faster()
+                        if event.key == pygame.K_LEFTBRACKET:
+                            simulation.slower()
+                        if event.key == pygame.K_c and obstacle_field:
+                            obstacle_field.clear()
+                            simulation.set_obstacles(obstacle_field.copy())
+                        if event.key == pygame.K_p:
+                            num_predators = max(0, num_predators + (-1 if event.mod & pygame.KMOD_SHIFT else 1))
+                            simulation.set_predators(num_predators)
+                    if not hideUI:
+                    # Handle input box events
+                        ui_elements["separation_input"].handle_event(event)
+                        ui_elements["alignment_input"].handle_event(event)
+                        ui_elements["cohesion_input"].handle_event(event)
+                        ui_elements["max_speed_input"].handle_event(event)
+                        ui_elements["perception_radius_input"].handle_event(event)
+                        ui_elements["boid_count_input"].handle_event(event)
+                        ui_elements["reset_button"].handle_event(event)
+                        ui_elements["perception_circle_button"].handle_event(event)
+                        # Retrieve the number of boids from the input box
+                        new_boid_count = ui_elements["boid_count_input"].get_value()
+
+                        # Check if the number of boids has changed
+                        if num_boids != new_boid_count:
+                            simulation.resize(new_boid_count)
+                            num_boids = new_boid_count
+                        if event.type == pygame.MOUSEBUTTONDOWN:
+                            if ui_elements["reset_button"].is_clicked(event.pos):
+                                # Reset UI inputs to default values
+                                ui_elements["separation_input"].value = DEFAULTS["separation"]
+                                ui_elements["separation_input"].text = f"{DEFAULTS['separation']:.2f}"
+
+                                ui_elements["alignment_input"].value = DEFAULTS["alignment"]
+                                ui_elements["alignment_input"].text = f"{DEFAULTS['alignment']:.2f}"
+
+                                ui_elements["cohesion_input"].value = DEFAULTS["cohesion"]
+                                ui_elements["cohesion_input"].text = f"{DEFAULTS['cohesion']:.2f}"
+
+                                ui_elements["max_speed_input"].value = DEFAULTS["max_speed"]
+                                ui_elements["max_speed_input"].text = f"{DEFAULTS['max_speed']:.2f}"
+
+                                ui_elements["perception_radius_input"].value = DEFAULTS["perception_radius"]
+                                ui_elements["perception_radius_input"].text = f"{DEFAULTS['perception_radius']:.2f}"
+
+                                ui_elements["boid_count_input"].value = DEFAULTS["number_boids"]
+                                ui_elements["boid_count_input"].text = f"{DEFAULTS['number_boids']}"
+
+                                show_radius = DEFAULTS["show_perception"]
+                                # Reset flock
+                                flock = VectorFlock(NUM_BOIDS, screen_width, screen_height, profiler=profiler, seed=args.seed,
+                                                    num_predators=num_predators)
+                                flock.set_obstacles(obstacle_field.copy())
+                                simulation.replace_flock(flock)
+                                num_boids = NUM_BOIDS
+                            if ui_elements["perception_circle_button"].is_clicked(event.pos):
+                                show_radius = not show_radius
+
+                if pending_size is not None and time.perf_counter() >= resize_due:
+                    # Adapt to the new window size in place: the flock, typed values and plot history are kept
+                    screen_width, screen_height = pending_size
+                    pending_size = None
+                    screen = pygame.display.set_mode((screen_width, screen_height), pygame.RESIZABLE)
+                    background = scale_background(screen_width, screen_height)
+                    previous_rects = None
+                    clear_sprite_cache()  # Sprite size follows the window height
+                    simulation.set_world_size(screen_width, screen_height)
+                    obstacle_field.set_world_size(screen_width, screen_height)  # As the simulation thread does with its copy
+                    reposition_ui(ui_elements, screen_width, screen_height)
+                    velocity_geometry, neighbour_geometry = plot_geometry(screen_width, screen_height)
+                    live_plot.reposition(**velocity_geometry)
+                    live_plot_neighbors.reposition(**neighbour_geometry)
+
+            # Hand changed input box values to the worker
+            new_parameters = read_parameters(ui_elements)
+            if new_parameters != parameters:
+                parameters = new_parameters
+                simulation.set_parameters(**parameters)
+
+            with profiler.scope("background"):
+                if not args.dirty_rects or previous_rects is None or len(previous_rects) > DIRTY_RECT_LIMIT:
+                    screen.blit(background, (0, 0))
+                else:
+                    # Only paint the sky back where something was drawn last frame
+                    screen.blits([(background, rect, rect) for rect in previous_rects], doreturn=False)
+            frame_rects = []
+
+            if obstacle_field:
+                frame_rects.extend(obstacle_field.draw(screen))
+
+            frame, new_frame = simulation.latest()
+            drawn_positions = frame.positions
+            if frame.previous is not None:
+                drawn_positions = interpolate(frame.previous, frame.positions, frame.alpha(time.perf_counter()), frame.world_size)
+            with profiler.scope("draw"):
+                # Only the frame is drawn: the flock belongs to the simulation thread
+                boid_rects = draw_flock(screen, drawn_positions, frame.velocities, frame.world_size[1],
+                                        num_predators=frame.num_predators, return_rects=args.dirty_rects)
+            if args.dirty_rects:
+                frame_rects.extend(boid_rects)
+
+            if show_radius and len(frame) > 0:
+                frame_rects.append(draw_perception_radius(screen, drawn_positions[0], parameters["perception_radius"],
+                                                          frame.world_size[1]))
+
+            for sample in simulation.new_samples():
+                live_plot.add_data(sample["mean_speed"], parameters["max_speed"])
+                max_neighbours = len(frame) - 1  # Theoretical max neighbors
+                live_plot_neighbors.add_data(sample["mean_neighbours"], max_neighbours)
+
+            with profiler.scope("ui"):
+                if hideUI:
+                    # Render the semicircular menu
+                    ui_elements["menu_panel"].y =0
+                    frame_rects.append(ui_elements["menu_panel"].render(screen))
+                else:
+                    # Render the panel and input boxes
+                    ui_elements["menu_panel"].y = ui_elements["panel"].height
+                    frame_rects.append(ui_elements["menu_panel"].render(screen))
+                    frame_rects.append(ui_elements["panel"].rect)  # Everything below is drawn inside the panel
+
+                    ui_elements["static_layer"].render(screen)
+                    ui_elements["separation_input"].render(screen)
+                    ui_elements["alignment_input"].render(screen)
+                    ui_elements["cohesion_input"].render(screen)
+                    ui_elements["max_speed_input"].render(screen)
+                    ui_elements["perception_radius_input"].render(screen)
+                    ui_elements["reset_button"].render(screen)
+                    ui_elements["perception_circle_button"].render(screen)
+                    ui_elements["boid_count_input"].render(screen)
 
-    while running:
-        screen.fill((0, 0, 0))  # Clear screen
-        screen.blit(bg, (0, 0))
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.VIDEORESIZE:
-                # Update screen dimensions and UI layout on resize
-                screen_width, screen_height = event.w, event.h
-                screen = pygame.display.set_mode((screen_width, screen_height), pygame.RESIZABLE)
-                flock = Flock(NUM_BOIDS, screen_width, screen_height)
-                ui_elements = update_ui_layout(screen_width, screen_height)
-                ui_elements["menu_panel"].screen_height = screen_height
-
-                # Initialize live plot
-                live_plot = LivePlot(x=1.8*screen_width/5, y=0.5*screen_height/9, width=screen_width/4, height=screen_height/5, max_points=100,min_y_scale=1)
-                # Initialize live plot for neighbors
-                live_plot_neighbors = LivePlotNeighbours(x=live_plot.x, y=live_plot.y+1.7*live_plot.height, width=screen_width/4, height=screen_height/5, max_points=100, min_y_scale=3)
-                # Update live plots with new screen height
-                live_plot.set_screen_height(screen_height)
-                live_plot_neighbors.set_screen_height(screen_height)
-                
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if ui_elements["menu_panel"].is_clicked(event.pos):  # Detect click on semicircle
-                    hideUI = not hideUI
-            if event.type == pygame.KEYUP:
-                # if event.key == pygame.K_BACKSPACE:
-                #     backSpace = True
-                if (event.key == pygame.K_m or event.key == pygame.K_SPACE) or event.key == pygame.K_ESCAPE:
-                    hideUI = not hideUI
             if not hideUI:
-            # Handle input box events
-                ui_elements["separation_input"].handle_event(event)
-                ui_elements["alignment_input"].handle_event(event)
-                ui_elements["cohesion_input"].handle_event(event)
-                ui_elements["max_speed_input"].handle_event(event)
-                ui_elements["perception_radius_input"].handle_event(event)
-                ui_elements["boid_count_input"].handle_event(event)
-                ui_elements["reset_button"].handle_event(event)
-                ui_elements["perception_circle_button"].handle_event(event)
-                # Retrieve the number of boids from the input box
-                new_boid_count = ui_elements["boid_count_input"].get_value()
-
-                # Check if the number of boids has changed
-                if len(flock.boids) != new_boid_count:
-                    flock = Flock(new_boid_count, screen_width, screen_height)
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if ui_elements["reset_button"].is_clicked(event.pos):
-                        # Reset UI inputs to default values
-                        ui_elements["separation_input"].value = DEFAULTS["separation"]
-                        ui_elements["separation_input"].text = f"{DEFAULTS['separation']:.2f}"
-
-                        ui_elements["alignment_input"].value = DEFAULTS["alignment"]
-                        ui_elements["alignment_input"].text = f"{DEFAULTS['alignment']:.2f}"
-
-                        ui_elements["cohesion_input"].value = DEFAULTS["cohesion"]
-                        ui_elements["cohesion_input"].text = f"{DEFAULTS['cohesion']:.2f}"
-
-                        ui_elements["max_speed_input"].value = DEFAULTS["max_speed"]
-                        ui_elements["max_speed_input"].text = f"{DEFAULTS['max_speed']:.2f}"
-
-                        ui_elements["perception_radius_input"].value = DEFAULTS["perception_radius"]
-                        ui_elements["perception_radius_input"].text = f"{DEFAULTS['perception_radius']:.2f}"
-
-                        ui_elements["boid_count_input"].value = DEFAULTS["number_boids"]
-                        ui_elements["boid_count_input"].text = f"{DEFAULTS['number_boids']}"
-
-                        show_radius = DEFAULTS["show_perception"]
-                        # Reset flock
-                        flock = Flock(NUM_BOIDS, screen_width, screen_height)
-                    if ui_elements["perception_circle_button"].is_clicked(event.pos):
-                        show_radius = not show_radius
-
-        # Get input box values
-        separation_weight = ui_elements["separation_input"].get_value()
-        alignment_weight = ui_elements["alignment_input"].get_value()
-        cohesion_weight = ui_elements["cohesion_input"].get_value()
-        max_speed = ui_elements["max_speed_input"].get_value()
-        perception_radius = ui_elements["perception_radius_input"].get_value()
-
-        # Update flock with weights
-        flock.apply_rules(separation_weight, alignment_weight, cohesion_weight, perception_radius, max_speed)
-        flock.update(max_speed)
-        flock.draw(screen)
-
-        if show_radius and len(flock.boids) > 0:
-            flock.boids[0].draw_perception_radius(screen, ui_elements["perception_radius_input"].get_value())
-
-        if  len(flock.boids) > 0:
-            avg_velocity = sum(boid.velocity.length() for boid in flock.boids) / len(flock.boids)
-            live_plot.add_data(avg_velocity, max_speed)
-            avg_neighbors = sum(len(boid.get_neighbours(flock.boids, perception_radius)) for boid in flock.boids) / len(flock.boids)
-            max_neighbours = len(flock.boids) - 1  # Theoretical max neighbors
-            live_plot_neighbors.add_data(avg_neighbors, max_neighbours)
-
-        if hideUI:
-            # Render the semicircular menu
-            ui_elements["menu_panel"].y =0
-            ui_elements["menu_panel"].render(screen)
-        else:
-            # Render the panel and input boxes
-            ui_elements["menu_panel"].y = ui_elements["panel"].height
-            ui_elements["menu_panel"].render(screen)
-
-            ui_elements["panel"].Render(screen)
-            ui_elements["sub_panel"].Render(screen)
-            ui_elements["separation_label"].render(screen)
-            ui_elements["alignment_label"].render(screen)
-            ui_elements["cohesion_label"].render(screen)
-            ui_elements["max_speed_label"].render(screen)
-            ui_elements["perception_label"].render(screen)
-            ui_elements["radius_label"].render(screen)
-            ui_elements["total_label"].render(screen)
-            ui_elements["boids_label"].render(screen)
-            ui_elements["instructions_label"].render(screen)
-            ui_elements["separation_input"].render(screen)
-            ui_elements["alignment_input"].render(screen)
-            ui_elements["cohesion_input"].render(screen)
-            ui_elements["max_speed_input"].render(screen)
-            ui_elements["perception_radius_input"].render(screen)
-            ui_elements["reset_button"].render(screen)
-            ui_elements["perception_circle_button"].render(screen)
-            ui_elements["boid_count_input"].render(screen)
-
-            # Render live plot
-            
-            live_plot.render(screen)
-            live_plot_neighbors.render(screen)
-
-        pygame.display.flip()
-        clock.tick(60)
-
-    pygame.quit()
+                # Render live plot
+                with profiler.scope("plots"):
+                    live_plot.render(screen)
+                    live_plot_neighbors.render(screen)
+
+            if simulation.speed != 1:
+                speed_text = render_text(speed_font, f"x{simulation.speed:g}", (0, 0, 0))
+                frame_rects.append(screen.blit(speed_text, speed_text.get_rect(bottomright=(screen_width - 10, screen_height - 10))))
+
+            if show_profile:
+                frame_rects.append(profiler.draw_overlay(screen, clock.get_fps(), x=10, y=screen_height - 250))
+
+            with profiler.scope("flip"):
+                if not args.dirty_rects or previous_rects is None:
+                    pygame.display.flip()
+                else:
+                    changed = previous_rects + frame_rects
+                    if len(changed) > DIRTY_RECT_LIMIT:
+                        pygame.display.flip()
+                    else:
+                        pygame.display.update(changed)
+                previous_rects = frame_rects
+            profiler.record("frame", (time.perf_counter() - frame_start) * 1000)
+            clock.tick(60)
+    finally:
+        try:
+            simulation.stop()
+        finally:
+            # Also after an error on either thread, so the output files are complete
+            metrics.close()
+            if simulation.recorder is not None:
+                simulation.recorder.close()
+            if args.profile_dump:
+                profiler.dump(args.profile_dump)
+            pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,176 @@
+import csv
+import json
+import numpy as np
+from flock import VectorFlock
+from ring_buffer import RingBuffer
+from spatial_grid import pair_offsets
+from settings import METRICS_CAPACITY
+
+
+def flock_state(flock):
+    """Return the boids' positions and velocities as (N, 2) arrays for either engine, without predators."""
+    if isinstance(flock, VectorFlock):
+        n = len(flock)
+        return flock.positions[:n], flock.velocities[:n]
+    positions = np.array([[boid.position.x, boid.position.y] for boid in flock.boids]).reshape(-1, 2)
+    velocities = np.array([[boid.velocity.x, boid.velocity.y] for boid in flock.boids]).reshape(-1, 2)
+    return positions, velocities
+
+
+def _unit(vectors):
+    """Rows of vectors scaled to length 1, dropping zero rows."""
+    lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+    nonzero = lengths > 0
+    return vectors[nonzero] / lengths[nonzero, None], nonzero
+
+
+def mean_speed(flock, positions, velocities, radius):
+    return float(np.hypot(velocities[:, 0], velocities[:, 1]).mean())
+
+
+def speed_std(flock, positions, velocities, radius):
+    return float(np.hypot(velocities[:, 0], velocities[:, 1]).std())
+
+
+def polarization(flock, positions, velocities, radius):
+    """Length of the mean heading: 1 when every boid flies the same way, near 0 when headings are random."""
+    headings, _ = _unit(velocities)
+    return float(np.hypot(*headings.mean(axis=0))) if len(headings) else 0.0
+
+
+def milling(flock, positions, velocities, radius):
+    """Normalized angular momentum about the centre of mass: 1 when the flock circles it in one direction."""
+    headings, moving = _unit(velocities)
+    directions, outside = _unit(positions[moving] - positions.mean(axis=0))
+    if len(directions) == 0:
+        return 0.0
+    headings = headings[outside]
+    turning = directions[:, 0] * headings[:, 1] - directions[:, 1] * headings[:, 0]
+    return float(abs(turning.mean()))
+
+
+def mean_neighbours(flock, positions, velocities, radius):
+    return float(flock.neighbour_counts(radius).mean())
+
+
+def nearest_neighbour(flock, positions, velocities, radius):
+    """Mean distance to the nearest neighbour, over the boids with a neighbour within radius."""
+    i, j = flock.neighbour_pairs(radius)
+    if len(i) == 0:
+        return 0.0
+    offsets = pair_offsets(positions, i, j, flock.world_size)
+    # Pairs come grouped by i, so each boid's pairs form one contiguous run
+    starts = np.flatnonzero(np.diff(i, prepend=-1))
+    return float(np.minimum.reduceat(np.hypot(offsets[:, 0], offsets[:, 1]), starts).mean())
+
+
+COLLECTORS = {
+    "mean_speed": mean_speed,
+    "speed_std": speed_std,
+    "polarization": polarization,
+    "milling": milling,
+    "mean_neighbours": mean_neighbours,
+    "nearest_neighbour": nearest_neighbour,
+}
+
+
+def collect(flock, radius, collectors=None):
+    """
+    Evaluate collectors on the current flock state.
+
+    Args:
+        flock (Flock | VectorFlock): The flock to measure.
+        radius (float): Perception radius used by the neighbour based collectors.
+        collectors (dict): Name -> collector(flock, positions, velocities, radius).
+            Defaults to COLLECTORS.
+
+    Returns:
+        dict: Name -> value, every value 0.0 for an empty flock.
+    """
+    collectors = COLLECTORS if collectors is None else collectors
+    if len(flock) == 0:
+        return {name: 0.0 for name in collectors}
+    positions, velocities = flock_state(flock)
+    return {name: collector(flock, positions, velocities, radius) for name, collector in collectors.items()}
+
+
+class Metrics:
+    """
+    Order parameters of a flock sampled every few ticks.
+
+    Collectors are registered by name. Every interval ticks, step() evaluates
+    all of them, keeps the results in bounded RingBuffers (the data the live
+    plots read) and, when a path is given, appends them as one row to a .csv
+    file, or as one JSON line for any other extension. With interval 0
+    step() returns straight away.
+    """
+
+    def __init__(self, interval=1, capacity=METRICS_CAPACITY, path=None):
+        """
+        Args:
+            interval (int): Ticks between samples, 0 to disable sampling.
+            capacity (int): Number of recent samples kept per collector.
+            path (str): Optional file every sample is streamed to.
+        """
+        self.interval = interval
+        self.capacity = capacity
+        self.path = path
+        self.collectors = {}
+        self.buffers = {}  # Collector name -> RingBuffer of samples
+        self.ticks = RingBuffer(capacity)  # Tick each sample was taken at
+        self.tick = 0
+        self._file = None
+        self._writer = None
+
+    def register(self, name, collector):
+        """Add a collector(flock, positions, velocities, radius) returning a float."""
+        if self._file is not None:
+            raise RuntimeError("collectors must be registered before the first sample is streamed")
+        self.collectors[name] = collector
+        self.buffers[name] = RingBuffer(self.capacity)
+
+    def register_defaults(self):
+        """Register every collector in COLLECTORS."""
+        for name, collector in COLLECTORS.items():
+            self.register(name, collector)
+        return self
+
+    def step(self, flock, radius):
+        """
+        Count a tick and sample the flock if it is due.
+
+        Returns:
+            dict: The new sample, or None when no sample was taken.
+        """
+        self.tick += 1
+        if self.interval <= 0 or self.tick % self.interval:
+            return None
+        sample = collect(flock, radius, self.collectors)
+        self.ticks.append(self.tick)
+        for name, value in sample.items():
+            self.buffers[name].append(value)
+        if self.path is not None:
+            self._stream(sample)
+        return sample
+
+    def _stream(self, sample):
+        if self._file is None:
+            self._file = open(self.path, "w", newline="")
+            if self.path.lower().endswith(".csv"):
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(["tick"] + list(self.collectors))
+        if self._writer is not None:
+            self._writer.writerow([self.tick] + list(sample.values()))
+        else:
+            self._file.write(json.dumps({"tick": self.tick, **sample}) + "\n")
+
+    def values(self, name):
+        """Return the recent samples of one collector, oldest first."""
+        return self.buffers[name].values()
+
+    def close(self):
+        """Flush and close the output file, if any."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
@@ -0,0 +1,306 @@
+"""
+Static obstacles and the signed distance field the boids avoid them with.
+
+Obstacles (circles, polygons or a bitmap mask) are rasterized once onto a
+grid of OBSTACLE_CELL_SIZE cells covering the world. A Euclidean distance
+transform of that grid gives every cell its signed distance to the nearest
+obstacle edge, negative inside, and the gradient of that field points away
+from the obstacles. Every tick the avoidance force of all boids is a single
+vectorized lookup into these grids, so it costs the same however many
+obstacles there are. The field is only rebuilt when the obstacles or the
+world size change.
+"""
+import numpy as np
+import pygame
+from flock import _steer_towards
+from settings import OBSTACLE_CELL_SIZE, OBSTACLE_MARGIN, OBSTACLE_WEIGHT
+
+OBSTACLE_COLOR = (90, 90, 90)
+
+
+class Circle:
+    """A disc centred on (x, y)."""
+
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+
+    def rasterize(self, xs, ys, width, height):
+        """Return which of the points (xs, ys) lie inside the obstacle."""
+        return (xs - self.x) ** 2 + (ys - self.y) ** 2 <= self.radius ** 2
+
+    def scaled(self, sx, sy):
+        """The obstacle stretched with the world, keeping circles round."""
+        return Circle(self.x * sx, self.y * sy, self.radius * np.sqrt(sx * sy))
+
+    def draw(self, screen, width, height):
+        return pygame.draw.circle(screen, OBSTACLE_COLOR, (self.x, self.y), self.radius)
+
+
+class Polygon:
+    """A simple polygon given by its corners in order."""
+
+    def __init__(self, points):
+        self.points = [(float(x), float(y)) for x, y in points]
+
+    def rasterize(self, xs, ys, width, height):
+        """Return which of the points (xs, ys) lie inside the polygon, by the even-odd rule."""
+        inside = np.zeros(np.broadcast(xs, ys).shape, dtype=bool)
+        for (x0, y0), (x1, y1) in zip(self.points, self.points[1:] + self.points[:1]):
+            if y0 == y1:
+                continue
+            crosses = (y0 > ys) != (y1 > ys)
+            x_cross = x0 + (ys - y0) * (x1 - x0) / (y1 - y0)
+            inside ^= crosses & (xs < x_cross)
+        return inside
+
+    def scaled(self, sx, sy):
+        return Polygon([(x * sx, y * sy) for x, y in self.points])
+
+    def draw(self, screen, width, height):
+        return pygame.draw.polygon(screen, OBSTACLE_COLOR, self.points)
+
+
+class Mask:
+    """A bitmap of blocked pixels, stretched over the whole world."""
+
+    def __init__(self, blocked):
+        """
+        Args:
+            blocked (np.ndarray): (rows, columns) bool array, True where the
+                world is blocked. Row 0 is the top of the world.
+        """
+        self.blocked = np.asarray(blocked, dtype=bool)
+        self._surface = None  # Drawn mask, scaled to the last world size
+
+    @classmethod
+    def from_image(cls, path, threshold=128):
+        """Block the pixels of an image darker than threshold (0-255)."""
+        pixels = pygame.surfarray.array3d(pygame.image.load(path))  # (columns, rows, 3)
+        return cls(pixels.mean(axis=2).T < threshold)
+
+    def rasterize(self, xs, ys, width, height):
+        rows, columns = self.blocked.shape
+        r = np.clip((ys * rows / height).astype(np.intp), 0, rows - 1)
+        c = np.clip((xs * columns / width).astype(np.intp), 0, columns - 1)
+        return self.blocked[r, c]
+
+    def scaled(self, sx, sy):
+        return self  # Always covers the whole world
+
+    def draw(self, screen, width, height):
+        size = (int(width), int(height))
+        if self._surface is None or self._surface.get_size() != size:
+            colors = np.zeros(self.blocked.T.shape + (3,), dtype=np.uint8)
+            colors[self.blocked.T] = OBSTACLE_COLOR
+            surface = pygame.surfarray.make_surface(colors)
+            surface.set_colorkey((0, 0, 0))
+            self._surface = pygame.transform.scale(surface, size)
+        return screen.blit(self._surface, (0, 0))
+
+
+def _lower_envelope(f):
+    """
+    Squared distance transform along the second axis of f, one line per row.
+
+    For every row, the lower envelope of the parabolas (x - q)^2 + f[q]
+    (Felzenszwalb and Huttenlocher) is built in one sweep over the columns,
+    vectorized across the rows, and then read off for all cells at once:
+    linear in the size of f instead of quadratic in its width.
+
+    Args:
+        f (np.ndarray): (rows, columns) squared distances, inf where unknown.
+
+    Returns:
+        np.ndarray: (rows, columns) min over q of (x - q)^2 + f[q], inf for
+            rows without any finite value.
+    """
+    rows, columns = f.shape
+    width = columns + 1
+    finite = np.isfinite(f)
+    line = np.flatnonzero(finite.any(axis=1))
+    first = finite.argmax(axis=1)
+    k = np.full(rows, -1)  # Index of the rightmost parabola in the envelope
+    k[line] = 0
+    starts = np.arange(rows) * width
+    v = np.zeros(rows * width, dtype=np.intp)  # Vertices of the envelope's parabolas, width per row
+    v[starts[line]] = first[line]
+    h = np.empty(rows * width)  # f + vertex^2 of each of them
+    h[starts[line]] = f[line, first[line]] + first[line] ** 2.0
+    z = np.empty(rows * width)  # Left boundary of each parabola's stretch of the envelope
+    z[starts[line]] = -np.inf
+    added = (finite & (np.arange(columns) > first[:, None])).T.copy()
+    for q in range(columns):
+        line = np.flatnonzero(added[q])
+        hq = f[line, q] + q * q
+        while len(line):
+            at = starts[line] + k[line]
+            vk = v[at]
+            s = (hq - h[at]) / (2.0 * (q - vk))
+            hidden = s <= z[at]
+            k[line[hidden]] -= 1  # The new parabola hides the last one, never the first
+            keep = ~hidden
+            at = at[keep] + 1
+            k[line[keep]] += 1
+            v[at] = q
+            h[at] = hq[keep]
+            z[at] = s[keep]
+            line = line[hidden]
+            hq = hq[hidden]
+
+    # Each cell lies on the last parabola starting at or before it
+    owner, index = np.nonzero(np.arange(width) <= k[:, None])
+    first_cell = np.clip(np.ceil(z[starts[owner] + index]), 0, columns).astype(np.intp)
+    parabola = np.full((rows, width), -1)
+    np.maximum.at(parabola, (owner, first_cell), index)
+    parabola = np.maximum.accumulate(parabola[:, :columns], axis=1)
+    line = np.flatnonzero(k >= 0)
+
+    distance_sq = np.full((rows, columns), np.inf)
+    vk = v.reshape(rows, width)[line[:, None], parabola[line]]
+    distance_sq[line] = (np.arange(columns) - vk) ** 2 + np.take_along_axis(f[line], vk, axis=1)
+    return distance_sq
+
+
+def distance_transform(features):
+    """
+    Exact Euclidean distance from every cell to the nearest feature cell.
+
+    Separable: distances along the longer axis first, then
+    _lower_envelope along the shorter one, so that its Python loop runs
+    over as few columns as possible.
+
+    Args:
+        features (np.ndarray): (rows, columns) bool array.
+
+    Returns:
+        np.ndarray: (rows, columns) distances in cells, inf without any feature.
+    """
+    if not features.any():
+        return np.full(features.shape, np.inf)
+    # Make the columns the shorter axis, swept by _lower_envelope
+    transposed = features.shape[1] > features.shape[0]
+    if transposed:
+        features = features.T
+    rows = len(features)
+    index = np.arange(rows)[:, None]
+    above = np.maximum.accumulate(np.where(features, index, -np.inf), axis=0)
+    below = np.minimum.accumulate(np.where(features, index, np.inf)[::-1], axis=0)[::-1]
+    vertical = np.minimum(index - above, below - index)  # inf in columns without features
+    distance = np.sqrt(_lower_envelope(vertical ** 2))
+    return distance.T if transposed else distance
+
+
+class ObstacleField:
+    """
+    Obstacles in a world together with their signed distance and gradient grids.
+
+    Obstacles are kept as an immutable tuple; changing them or the world
+    size only marks the grids stale, and they are rebuilt on the next lookup.
+    """
+
+    def __init__(self, width, height, obstacles=(), cell_size=OBSTACLE_CELL_SIZE):
+        """
+        Args:
+            width (float): World width.
+            height (float): World height.
+            obstacles (iterable): Circle, Polygon or Mask obstacles.
+            cell_size (float): Side of a grid cell, the resolution of the field.
+        """
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.obstacles = tuple(obstacles)
+        self.distance = None  # (rows, columns) signed distance to the nearest obstacle edge
+        self.gradient = None  # (rows, columns, 2) unit vectors pointing away from the obstacles
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def copy(self):
+        """A field with the same obstacles and grids of its own, e.g. to hand to another thread."""
+        return ObstacleField(self.width, self.height, self.obstacles, self.cell_size)
+
+    def add(self, obstacle):
+        self.obstacles += (obstacle,)
+        self.distance = None
+
+    def clear(self):
+        self.obstacles = ()
+        self.distance = None
+
+    def set_world_size(self, width, height, rescale=True):
+        """Follow a resized world, stretching the obstacles with it unless rescale is False."""
+        if rescale:
+            sx, sy = width / self.width, height / self.height
+            self.obstacles = tuple(obstacle.scaled(sx, sy) for obstacle in self.obstacles)
+        self.width = width
+        self.height = height
+        self.distance = None
+
+    def rebuild(self):
+        """Rasterize the obstacles and compute the distance and gradient grids."""
+        columns = max(1, int(np.ceil(self.width / self.cell_size)))
+        rows = max(1, int(np.ceil(self.height / self.cell_size)))
+        xs = (np.arange(columns) + 0.5) * self.width / columns
+        ys = (np.arange(rows)[:, None] + 0.5) * self.height / rows
+        blocked = np.zeros((rows, columns), dtype=bool)
+        for obstacle in self.obstacles:
+            blocked |= obstacle.rasterize(xs, ys, self.width, self.height)
+
+        # Positive outside the obstacles, negative inside, zero on the edge between cells
+        cell = np.sqrt(self.width / columns * self.height / rows)
+        outside = distance_transform(blocked) - 0.5
+        inside = distance_transform(~blocked) - 0.5
+        # A fully blocked world has no edge to be pushed towards: keep the depth finite
+        self.distance = np.maximum(np.where(blocked, -inside, outside) * cell, -max(self.width, self.height))
+        finite = np.where(np.isfinite(self.distance), self.distance, 0.0)
+        gx = np.gradient(finite, self.width / columns, axis=1) if columns > 1 else np.zeros_like(finite)
+        gy = np.gradient(finite, self.height / rows, axis=0) if rows > 1 else np.zeros_like(finite)
+        gradient = np.stack((gx, gy), axis=2)
+        lengths = np.hypot(gx, gy)[..., None]
+        self.gradient = np.divide(gradient, lengths, out=np.zeros_like(gradient), where=lengths > 0)
+
+    def _cells(self, positions):
+        rows, columns = self.distance.shape
+        r = np.clip((positions[:, 1] * rows / self.height).astype(np.intp), 0, rows - 1)
+        c = np.clip((positions[:, 0] * columns / self.width).astype(np.intp), 0, columns - 1)
+        return r, c
+
+    def lookup(self, positions):
+        """
+        Signed distance and direction away from the nearest obstacle at every position.
+
+        Returns:
+            tuple: (N,) distances, negative inside an obstacle, and (N, 2) unit vectors.
+        """
+        if self.distance is None:
+            self.rebuild()
+        r, c = self._cells(positions)
+        return self.distance[r, c], self.gradient[r, c]
+
+    def forces(self, positions, velocities, max_speed, max_force, margin=OBSTACLE_MARGIN, weight=OBSTACLE_WEIGHT):
+        """
+        Avoidance acceleration of every boid.
+
+        Boids closer than margin to an obstacle steer away from it, harder the
+        closer they are; boids inside an obstacle are pushed out the nearest way.
+
+        Returns:
+            np.ndarray: (N, 2) accelerations, zero for boids far from every obstacle.
+        """
+        accelerations = np.zeros((len(positions), 2))
+        if not self.obstacles or len(positions) == 0:
+            return accelerations
+        distances, away = self.lookup(positions)
+        near = np.flatnonzero(distances < margin)
+        if len(near):
+            urgency = (margin - distances[near]) / margin
+            steer = _steer_towards(away[near], velocities[near], max_speed, max_force)
+            accelerations[near] = steer * (weight * urgency)[:, None]
+        return accelerations
+
+    def draw(self, screen):
+        """Draw every obstacle and return the rectangles they cover."""
+        return [obstacle.draw(screen, self.width, self.height) for obstacle in self.obstacles]
@@ -0,0 +1,171 @@
+"""
+Multi-process flock stepping over spatial tiles.
+
+The world is split into vertical strips holding about the same number of
+boids. Every strip is handed to a worker process together with a halo of
+the boids within one perception radius of it, across the wrapped edges.
+Workers read the positions and velocities from shared memory and write the
+accelerations of the boids they own back into it, so nothing but the strip
+bounds and rule parameters is pickled per tick. Integration stays in the
+main process.
+
+Workers find neighbours with the same SpatialGrid cells and in the same
+order as VectorFlock, so the result is bit for bit the serial one.
+Predator and obstacle forces are cheap and added by the main process.
+"""
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+import numpy as np
+from flock import VectorFlock, _flocking_forces
+from spatial_grid import SpatialGrid, NeighbourSets
+
+# Shared block the current worker process is attached to, as (name, SharedMemory)
+_attached = None
+
+
+def _shared_arrays(buffer, num_rows):
+    """Positions, velocities and accelerations views of one shared block."""
+    arrays = np.ndarray((3, num_rows, 2), dtype=np.float64, buffer=buffer)
+    return arrays[0], arrays[1], arrays[2]
+
+
+def _attach(name):
+    global _attached
+    if _attached is None or _attached[0] != name:
+        if _attached is not None:
+            _attached[1].close()
+        _attached = (name, shared_memory.SharedMemory(name=name))
+    return _attached[1]
+
+
+def strip_bounds(positions, strips):
+    """
+    Split the flock into vertical strips with about the same number of boids.
+
+    Returns:
+        np.ndarray: strips + 1 increasing x bounds, the outer ones infinite so
+            every boid falls into exactly one strip [bounds[k], bounds[k + 1]).
+    """
+    inner = np.quantile(positions[:, 0], np.arange(1, strips) / strips) if len(positions) else np.zeros(strips - 1)
+    return np.concatenate(([-np.inf], inner, [np.inf]))
+
+
+def _tile_forces(task):
+    """Worker: compute the accelerations of the boids in one strip, in place."""
+    name, num_rows, num_boids, x0, x1, radius, weights, max_speed, max_force, world, periodic = task
+    positions, velocities, accelerations = _shared_arrays(_attach(name).buf, num_rows)
+    width, height = world
+    x = positions[:num_boids, 0]  # Predators, in the rows after the boids, are handled by the main process
+    inside = (x >= x0) & (x < x1)
+    owned = np.flatnonzero(inside)
+    if len(owned) == 0:
+        return 0
+
+    # The halo: boids less than a radius left or right of the strip, across the wrapped edges
+    left, right = max(x0, 0.0), min(x1, width)
+    candidates = np.flatnonzero(inside | ((left - x) % width <= radius) | ((x - right) % width <= radius))
+    grid = SpatialGrid(width, height, radius)
+    grid.rebuild(positions, index=candidates)
+    i, j = grid.neighbour_pairs(positions, radius, periodic, queries=owned)
+    sets = NeighbourSets(np.searchsorted(owned, i), j, len(owned))
+    accelerations[owned] = _flocking_forces(
+        positions, velocities, sets, weights, max_speed, max_force, world if periodic else None, boids=owned,
+    )
+    return len(owned)
+
+
+class ParallelVectorFlock(VectorFlock):
+    """
+    VectorFlock whose rules are evaluated by a pool of worker processes.
+
+    The state arrays live in one shared memory block, re-created when the
+    number of boids changes. Everything else, including neighbour queries
+    for statistics, works as in VectorFlock. Call close() (or use the flock
+    as a context manager) to stop the workers and free the block.
+    """
+
+    def __init__(self, num_boids, screen_width, screen_height, workers=None, periodic=False, profiler=None, seed=None,
+                 num_predators=0):
+        """
+        Args:
+            workers (int): Worker processes, and strips per tick. Defaults to
+                the number of CPUs.
+
+        The other arguments are those of VectorFlock.
+        """
+        super().__init__(num_boids, screen_width, screen_height, periodic=periodic, profiler=profiler, seed=seed,
+                         num_predators=num_predators)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._block = None
+        self._shared = None  # The arrays currently backed by _block
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _share(self):
+        """Move the state arrays into shared memory unless they already are."""
+        if self._shared is not None and all(a is b for a, b in zip(self._shared, self._state_arrays())):
+            return
+        n = len(self.positions)
+        if self._block is None or self._block.size < 3 * n * 2 * 8:
+            self._release_block()
+            self._block = shared_memory.SharedMemory(create=True, size=3 * n * 2 * 8)
+        shared = _shared_arrays(self._block.buf, n)
+        for target, source in zip(shared, self._state_arrays()):
+            target[:] = source
+        self.positions, self.velocities, self.accelerations = self._shared = shared
+
+    def _state_arrays(self):
+        return self.positions, self.velocities, self.accelerations
+
+    def apply_rules(self, separation_weight, alignment_weight, cohesion_weight, perception_radius, maxspeed):
+        if perception_radius <= 0 or len(self) == 0:
+            super().apply_rules(separation_weight, alignment_weight, cohesion_weight, perception_radius, maxspeed)
+            return
+        self.parameters = {
+            "separation": separation_weight,
+            "alignment": alignment_weight,
+            "cohesion": cohesion_weight,
+            "perception_radius": perception_radius,
+            "max_speed": maxspeed,
+        }
+        with self.profiler.scope("rules"):
+            self._share()
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.workers)
+            bounds = strip_bounds(self.positions[:len(self)], self.workers)
+            tasks = [
+                (self._block.name, len(self.positions), len(self), float(x0), float(x1), perception_radius,
+                 (separation_weight, alignment_weight, cohesion_weight), maxspeed, self.max_force,
+                 (self.screen_width, self.screen_height), self.periodic)
+                for x0, x1 in zip(bounds[:-1], bounds[1:])
+            ]
+            self._pool.map(_tile_forces, tasks, chunksize=1)
+        self.add_predator_forces(self.accelerations, maxspeed)
+        self.add_obstacle_forces(self.accelerations, maxspeed)
+
+    def _release_block(self):
+        if self._block is None:
+            return
+        # Arrays still backed by the block are copied out before it goes away
+        if self._shared is not None:
+            self.positions, self.velocities, self.accelerations = (
+                np.array(array) if array is shared else array for array, shared in zip(self._state_arrays(), self._shared)
+            )
+        self._shared = None
+        self._block.close()
+        self._block.unlink()
+        self._block = None
+
+    def close(self):
+        """Stop the worker processes and free the shared memory."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._release_block()
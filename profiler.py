@@ -0,0 +1,155 @@
+import csv
+import json
+import threading
+import time
+from contextlib import nullcontext
+import numpy as np
+import pygame
+from ring_buffer import RingBuffer
+from fonts import get_font
+
+_NULL_SCOPE = nullcontext()
+
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start", "nested")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._open_scopes().append(self)
+        self.nested = 0.0  # Milliseconds spent in scopes opened inside this one
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        milliseconds = (time.perf_counter() - self.start) * 1000
+        open_scopes = self.profiler._open_scopes()
+        open_scopes.pop()
+        if open_scopes:
+            open_scopes[-1].nested += milliseconds
+        self.profiler.record(self.name, milliseconds - self.nested)
+
+
+class Profiler:
+    """
+    Named timing scopes for the stages of a frame.
+
+    Every stage keeps its most recent samples in a RingBuffer, plus a running
+    total over the whole run, so the cost stays constant however long the
+    simulation runs.
+
+    A scope opened inside another one is counted in the inner stage only:
+    the outer stage records its own time without it, so no time is counted
+    twice and the stages add up to the frame.
+    """
+
+    def __init__(self, window=120, enabled=True):
+        """
+        Args:
+            window (int): Number of recent samples kept per stage.
+            enabled (bool): When False, scope() does nothing.
+        """
+        self.window = window
+        self.enabled = enabled
+        self.samples = {}  # Stage name -> RingBuffer of milliseconds
+        self.totals = {}  # Stage name -> [total milliseconds, number of samples]
+        self.font = None
+        self._local = threading.local()  # Per thread: scopes entered and not yet left, innermost last
+
+    def scope(self, name):
+        """
+        Time a block of code under the given stage name.
+
+        Example:
+            with profiler.scope("update"):
+                flock.update(max_speed)
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def _open_scopes(self):
+        try:
+            return self._local.scopes
+        except AttributeError:
+            scopes = self._local.scopes = []
+            return scopes
+
+    def record(self, name, milliseconds):
+        """Add one timing sample to a stage. Stages may be timed from more than one thread."""
+        buffer = self.samples.get(name)
+        if buffer is None:
+            self.totals[name] = [0.0, 0]
+            buffer = RingBuffer(self.window)
+            buffer.append(milliseconds)
+            self.samples[name] = buffer  # Published only once it holds a sample, for readers on other threads
+        else:
+            buffer.append(milliseconds)
+        total = self.totals[name]
+        total[0] += milliseconds
+        total[1] += 1
+
+    def summary(self):
+        """
+        Summarize every stage.
+
+        Returns:
+            dict: Stage name -> mean, 95th percentile and max over the recent
+                window, plus the mean and number of samples over the whole run.
+        """
+        result = {}
+        for name, buffer in list(self.samples.items()):
+            recent = buffer.values()
+            total, count = self.totals[name]
+            result[name] = {
+                "mean_ms": float(recent.mean()),
+                "p95_ms": float(np.percentile(recent, 95)),
+                "max_ms": float(recent.max()),
+                "run_mean_ms": total / count,
+                "samples": count,
+            }
+        return result
+
+    def dump(self, path):
+        """Write summary() to a .csv file, or to JSON for any other extension."""
+        summary = self.summary()
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "mean_ms", "p95_ms", "max_ms", "run_mean_ms", "samples"])
+                for name, stats in summary.items():
+                    writer.writerow([name, stats["mean_ms"], stats["p95_ms"], stats["max_ms"], stats["run_mean_ms"], stats["samples"]])
+        else:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+
+    def draw_overlay(self, screen, fps, x=10, y=10):
+        """
+        Draw the FPS and the mean time of every stage over the recent window.
+
+        Args:
+            screen (pygame.Surface): The surface to draw on.
+            fps (float): Current frames per second.
+            x (int): Left edge of the overlay.
+            y (int): Top edge of the overlay.
+
+        Returns:
+            pygame.Rect: The area covered by the overlay.
+        """
+        if self.font is None:
+            self.font = get_font(None, 22)
+        lines = [f"FPS {fps:5.1f}"]
+        lines += [f"{name:<12}{buffer.values().mean():7.2f} ms" for name, buffer in list(self.samples.items())]
+        # The numbers change every frame, so these bypass the text cache
+        surfaces = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(surface.get_width() for surface in surfaces) + 10
+        height = sum(surface.get_height() for surface in surfaces) + 10
+        background = pygame.Surface((width, height), pygame.SRCALPHA)
+        background.fill((0, 0, 0, 160))
+        rect = screen.blit(background, (x, y))
+        for surface in surfaces:
+            screen.blit(surface, (x + 5, y + 5))
+            y += surface.get_height()
+        return rect
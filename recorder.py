@@ -0,0 +1,155 @@
+"""
+Record flock trajectories to a raw, memory-mappable binary file.
+
+File layout:
+    8 bytes   magic b"BOIDTRJ1"
+    4 bytes   little-endian uint32 length of the JSON header
+    header    JSON with num_boids, dt (ticks between frames), world_size and
+              the run parameters, padded with spaces to a multiple of 64 bytes
+    frames    float32 array of shape (frames, 2, num_boids, 2): positions then
+              velocities of every boid, one frame after another
+
+The number of frames follows from the file size, so a run that was cut off
+still leaves a readable file.
+"""
+import json
+import queue
+import struct
+import threading
+import numpy as np
+from metrics import flock_state
+from settings import RECORDER_BUFFER_BYTES
+
+MAGIC = b"BOIDTRJ1"
+HEADER_ALIGN = 64
+FRAME_DTYPE = np.dtype("<f4")
+
+
+def _frame_bytes(num_boids):
+    return 2 * num_boids * 2 * FRAME_DTYPE.itemsize
+
+
+def write_header(f, header):
+    """Write the magic, header length and padded JSON header to an open binary file."""
+    text = json.dumps(header).encode()
+    size = len(MAGIC) + 4 + len(text)
+    text += b" " * (-size % HEADER_ALIGN)
+    f.write(MAGIC + struct.pack("<I", len(text)) + text)
+
+
+def read_header(path):
+    """
+    Read the header of a trajectory file.
+
+    Returns:
+        tuple: (header dict, byte offset of the first frame).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + 4 + length
+
+
+def open_trajectory(path):
+    """
+    Map the frames of a trajectory file without reading them.
+
+    Returns:
+        tuple: (header dict, read-only memmap of shape (frames, 2, num_boids, 2)).
+    """
+    header, offset = read_header(path)
+    num_boids = header["num_boids"]
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        frames = (f.tell() - offset) // _frame_bytes(num_boids) if num_boids else 0
+    if frames == 0:
+        return header, np.empty((0, 2, num_boids, 2), dtype=FRAME_DTYPE)
+    return header, np.memmap(path, dtype=FRAME_DTYPE, mode="r", offset=offset, shape=(frames, 2, num_boids, 2))
+
+
+class TrajectoryRecorder:
+    """
+    Append every dt-th tick of a flock to a trajectory file from a background thread.
+
+    record() only copies the state into a float32 frame and queues it; a
+    writer thread does the disk I/O. The queue holds at most
+    RECORDER_BUFFER_BYTES of frames (at least one). When the disk falls
+    behind, record() blocks until the writer has caught up, so memory use
+    stays bounded.
+    """
+
+    def __init__(self, path, num_boids, dt=1, world_size=None, parameters=None, buffer_bytes=RECORDER_BUFFER_BYTES):
+        """
+        Args:
+            path (str): File to create.
+            num_boids (int): Number of boids in every frame.
+            dt (int): Ticks between recorded frames.
+            world_size (tuple): (width, height) of the world.
+            parameters (dict): Run parameters stored in the header.
+            buffer_bytes (int): Size of the queued frames before record() blocks.
+        """
+        if dt < 1:
+            raise ValueError("dt must be at least 1")
+        self.path = path
+        self.num_boids = num_boids
+        self.dt = dt
+        self.world_size = tuple(world_size) if world_size is not None else None
+        self.tick = 0
+        self.frames = 0
+        self._error = None
+        self._file = open(path, "wb")
+        write_header(self._file, {
+            "num_boids": num_boids,
+            "dt": dt,
+            "world_size": list(self.world_size) if self.world_size is not None else None,
+            "parameters": parameters or {},
+        })
+        self._queue = queue.Queue(maxsize=max(1, buffer_bytes // max(1, _frame_bytes(num_boids))))
+        self._thread = threading.Thread(target=self._write_frames, name="trajectory-writer", daemon=True)
+        self._thread.start()
+
+    def _write_frames(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            if self._error is None:
+                try:
+                    self._file.write(frame)  # Contiguous, written without a copy
+                except OSError as error:
+                    self._error = error
+
+    def record(self, flock):
+        """
+        Count a tick and queue the flock's state if it falls on the recording interval.
+
+        Returns:
+            bool: True when a frame was queued.
+        """
+        if self._error is not None:
+            raise self._error
+        self.tick += 1
+        if (self.tick - 1) % self.dt:
+            return False
+        if len(flock) != self.num_boids:
+            raise ValueError(f"recording {self.num_boids} boids but the flock has {len(flock)}")
+        positions, velocities = flock_state(flock)
+        frame = np.empty((2, self.num_boids, 2), dtype=FRAME_DTYPE)
+        frame[0] = positions
+        frame[1] = velocities
+        self._queue.put(frame)  # Blocks while the writer is a full buffer behind
+        self.frames += 1
+        return True
+
+    def close(self):
+        """Write out the queued frames and close the file."""
+        if self._file is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._file = None
+        if self._error is not None:
+            raise self._error
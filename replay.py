@@ -0,0 +1,215 @@
+"""
+Replay a recorded trajectory (see recorder.py) without re-simulating it.
+
+Frames are memory mapped, so opening even a very long recording is instant
+and only the frames on screen are read from disk.
+
+Example:
+    python replay.py run.traj --speed 2
+
+Keys:
+    Space                 pause / resume
+    Left / Right          step one frame back / forward (pauses)
+    Page Up / Page Down   seek back / forward by a tenth of the recording
+    Home / End            jump to the first / last frame
+    Up / Down             double / halve the playback speed
+    P                     show / hide the live plots
+    Escape                quit
+Clicking the progress bar at the bottom seeks to that frame.
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import sys
+import numpy as np
+import pygame
+from flock import VectorFlock
+from LivePlot import LivePlot, LivePlotNeighbours
+from metrics import collect, COLLECTORS
+from recorder import open_trajectory
+from fonts import get_font
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, DEFAULTS
+
+MIN_SPEED = 1 / 16
+MAX_SPEED = 64
+
+
+class Replay:
+    """Playback cursor over the frames of a trajectory."""
+
+    def __init__(self, frames, speed=1.0):
+        """
+        Args:
+            frames (np.ndarray): (frames, 2, N, 2) positions and velocities, e.g.
+                from open_trajectory().
+            speed (float): Frames advanced per displayed frame.
+        """
+        self.frames = frames
+        self.speed = speed
+        self.position = 0.0  # Fractional frame index, so slow speeds still advance
+        self.paused = False
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def frame(self):
+        """Index of the frame currently shown."""
+        return int(self.position)
+
+    def advance(self):
+        """Move forward by speed frames unless paused. Pauses on the last frame."""
+        if self.paused:
+            return
+        self.position = min(self.position + self.speed, len(self) - 1)
+        if self.frame == len(self) - 1:
+            self.paused = True
+
+    def seek(self, index):
+        """Jump to a frame, clamped to the recording."""
+        self.position = float(min(max(int(index), 0), len(self) - 1))
+
+    def step(self, count):
+        """Pause and move count frames forward (negative for backward)."""
+        self.paused = True
+        self.seek(self.frame + count)
+
+    def toggle_pause(self):
+        if self.paused and self.frame == len(self) - 1:
+            self.seek(0)  # Resuming at the end starts over
+        self.paused = not self.paused
+
+    def faster(self):
+        self.speed = min(self.speed * 2, MAX_SPEED)
+
+    def slower(self):
+        self.speed = max(self.speed / 2, MIN_SPEED)
+
+    def state(self):
+        """Return the positions and velocities of the current frame as float arrays."""
+        frame = self.frames[self.frame]
+        return np.asarray(frame[0], dtype=float), np.asarray(frame[1], dtype=float)
+
+
+def progress_bar_rect(screen_width, screen_height):
+    return pygame.Rect(10, screen_height - 20, screen_width - 20, 10)
+
+
+def draw_status(screen, replay, dt, font):
+    """Draw the frame counter, speed and the progress bar."""
+    width, height = screen.get_size()
+    bar = progress_bar_rect(width, height)
+    pygame.draw.rect(screen, (255, 255, 255), bar)
+    done = bar.width * replay.frame / max(1, len(replay) - 1)
+    pygame.draw.rect(screen, (255, 0, 0), (bar.x, bar.y, done, bar.height))
+    pygame.draw.rect(screen, (0, 0, 0), bar, 1)
+
+    status = f"frame {replay.frame + 1}/{len(replay)}  tick {replay.frame * dt}  x{replay.speed:g}"
+    if replay.paused:
+        status += "  paused"
+    # Changes every frame, so this bypasses the text cache
+    text = font.render(status, True, (0, 0, 0))
+    screen.blit(text, (bar.x, bar.y - text.get_height() - 4))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded boids trajectory.")
+    parser.add_argument("path", help="Trajectory file written with --record.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Recorded frames advanced per displayed frame.")
+    parser.add_argument("--fps", type=int, default=60, help="Displayed frames per second.")
+    parser.add_argument("--radius", type=float, default=None,
+                        help="Perception radius for the neighbour plot (defaults to the recorded one).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    header, frames = open_trajectory(args.path)
+    if len(frames) == 0:
+        print(f"{args.path} holds no frames", file=sys.stderr)
+        return 1
+    parameters = header["parameters"]
+    screen_width, screen_height = header["world_size"] or (SCREEN_WIDTH, SCREEN_HEIGHT)
+    radius = args.radius if args.radius is not None else parameters.get("perception_radius", DEFAULTS["perception_radius"])
+    max_speed = parameters.get("max_speed", DEFAULTS["max_speed"])
+
+    pygame.init()
+    screen = pygame.display.set_mode((int(screen_width), int(screen_height)))
+    pygame.display.set_caption(f"Boids Replay - {os.path.basename(args.path)}")
+    clock = pygame.time.Clock()
+    background = pygame.transform.smoothscale(pygame.image.load("stockimage_sky.jpg"), screen.get_size()).convert()
+    font = get_font(None, 22)
+
+    # Drawing and neighbour counting reuse the simulation engine, fed with recorded states
+    flock = VectorFlock(0, screen_width, screen_height)
+    live_plot = LivePlot(x=1.8*screen_width/5, y=0.5*screen_height/9, width=screen_width/4, height=screen_height/5, max_points=100, min_y_scale=1, screen_height=screen_height)
+    live_plot_neighbors = LivePlotNeighbours(x=live_plot.x, y=live_plot.y+1.7*live_plot.height, width=screen_width/4, height=screen_height/5, max_points=100, min_y_scale=3, screen_height=screen_height)
+    plotted = {"mean_speed": COLLECTORS["mean_speed"], "mean_neighbours": COLLECTORS["mean_neighbours"]}
+    show_plots = True
+
+    replay = Replay(frames, speed=args.speed)
+    shown = None  # Frame the flock and plots were last updated for
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_SPACE:
+                    replay.toggle_pause()
+                elif event.key == pygame.K_RIGHT:
+                    replay.step(1)
+                elif event.key == pygame.K_LEFT:
+                    replay.step(-1)
+                elif event.key == pygame.K_PAGEDOWN:
+                    replay.seek(replay.frame + max(1, len(replay) // 10))
+                elif event.key == pygame.K_PAGEUP:
+                    replay.seek(replay.frame - max(1, len(replay) // 10))
+                elif event.key == pygame.K_HOME:
+                    replay.seek(0)
+                elif event.key == pygame.K_END:
+                    replay.seek(len(replay) - 1)
+                elif event.key == pygame.K_UP:
+                    replay.faster()
+                elif event.key == pygame.K_DOWN:
+                    replay.slower()
+                elif event.key == pygame.K_p:
+                    show_plots = not show_plots
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                bar = progress_bar_rect(*screen.get_size())
+                if bar.inflate(0, 10).collidepoint(event.pos):
+                    replay.seek((event.pos[0] - bar.x) / bar.width * (len(replay) - 1))
+
+        if replay.frame != shown:
+            if shown is not None and replay.frame < shown:
+                # The plots show history, which no longer leads up to this frame
+                for plot in (live_plot, live_plot_neighbors):
+                    plot.data.clear()
+                live_plot.max_speed.clear()
+                live_plot_neighbors.max_neighbours.clear()
+            flock.positions, flock.velocities = replay.state()
+            flock.invalidate_neighbours()
+            sample = collect(flock, radius, plotted)
+            live_plot.add_data(sample["mean_speed"], max_speed)
+            live_plot_neighbors.add_data(sample["mean_neighbours"], len(flock) - 1)
+            shown = replay.frame
+
+        screen.blit(background, (0, 0))
+        flock.draw(screen)
+        if show_plots:
+            live_plot.render(screen)
+            live_plot_neighbors.render(screen)
+        draw_status(screen, replay, header["dt"], font)
+        pygame.display.flip()
+        clock.tick(args.fps)
+        replay.advance()
+
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity first-in first-out buffer of floats backed by a NumPy array."""
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity (int): Number of most recent values kept.
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity)
+        self._next = 0  # Slot the next value is written to
+        self._size = 0
+        self._max = None  # Largest stored value, None until it has to be recomputed
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        """Add a value, overwriting the oldest one when the buffer is full."""
+        dropped = self._data[self._next] if self._size == self.capacity else None
+        self._data[self._next] = value
+        if self._max is not None:
+            if value >= self._max:
+                self._max = value
+            elif dropped is not None and dropped >= self._max:
+                self._max = None  # The maximum just fell out of the window
+        self._next = (self._next + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def values(self):
+        """Return the stored values, oldest first, as a new array."""
+        if self._size < self.capacity:
+            return self._data[:self._size].copy()
+        return np.concatenate((self._data[self._next:], self._data[:self._next]))
+
+    def last(self):
+        """Return the most recent value."""
+        if self._size == 0:
+            raise IndexError("last() on an empty RingBuffer")
+        return self._data[self._next - 1]
+
+    def max(self):
+        """
+        Return the largest stored value.
+
+        The maximum is kept up to date on append and only rescanned after the
+        value holding it is overwritten.
+        """
+        if self._size == 0:
+            raise ValueError("max() on an empty RingBuffer")
+        if self._max is None:
+            self._max = self._data[:self._size].max()
+        return self._max
+
+    def clear(self):
+        self._next = 0
+        self._size = 0
+        self._max = None
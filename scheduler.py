@@ -0,0 +1,98 @@
+"""
+Fixed-timestep scheduling of simulation steps, decoupled from the frame rate.
+
+The simulation thread hands the scheduler the wall-clock time that passed
+and gets back how many whole simulation steps to run. Between steps the
+boids are drawn part of the way from their previous to their current
+positions, so motion stays smooth whether a frame shows zero, one or
+dozens of new steps.
+"""
+import numpy as np
+from settings import SIMULATION_RATE, STEP_BUDGET_SECONDS
+
+MIN_SPEED = 1 / 4
+MAX_SPEED = 100
+
+
+class FixedStepScheduler:
+    """
+    Turns elapsed wall-clock time into a whole number of fixed simulation steps.
+
+    Time is collected in an accumulator and spent in steps of 1 / rate
+    seconds, so the simulation advances at the same pace and through the
+    same states however fast frames are drawn. speed scales the pace for
+    slow motion or fast-forward. Steps due beyond what fits in step_budget
+    seconds of computing per batch, judged from the measured cost of recent
+    steps, are dropped: under load the simulation slows down instead of
+    falling ever further behind, and queued commands are applied promptly.
+    """
+
+    def __init__(self, rate=SIMULATION_RATE, speed=1.0, step_budget=STEP_BUDGET_SECONDS):
+        """
+        Args:
+            rate (float): Simulation steps per second at speed 1.
+            speed (float): Multiple of real time to simulate.
+            step_budget (float): Seconds one batch of steps may take.
+        """
+        self.step_seconds = 1 / rate
+        self.speed = speed
+        self.step_budget = step_budget
+        self.step_cost = None  # Smoothed seconds one step takes to compute
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        """
+        Add elapsed seconds of wall-clock time.
+
+        Returns:
+            int: Number of simulation steps due now.
+        """
+        self.accumulator += elapsed * self.speed
+        steps = int(self.accumulator // self.step_seconds)
+        self.accumulator -= steps * self.step_seconds
+        if self.step_cost and steps * self.step_cost > self.step_budget:
+            steps = max(1, int(self.step_budget / self.step_cost))
+            self.accumulator = 0.0  # Drop the backlog
+        return steps
+
+    def measure(self, steps, seconds):
+        """Report that steps steps took seconds to compute."""
+        if steps > 0:
+            cost = seconds / steps
+            self.step_cost = cost if self.step_cost is None else 0.9 * self.step_cost + 0.1 * cost
+
+    def until_next_step(self):
+        """Seconds of wall-clock time until the next step is due."""
+        return max(self.step_seconds - self.accumulator, 0.0) / self.speed
+
+    def faster(self):
+        self.speed = min(self.speed * 2, MAX_SPEED)
+
+    def slower(self):
+        self.speed = max(self.speed / 2, MIN_SPEED)
+
+    def reset(self):
+        """Forget the accumulated time, e.g. after the flock was replaced."""
+        self.accumulator = 0.0
+
+
+def interpolate(previous, current, alpha, world_size):
+    """
+    Positions a fraction alpha of the way from previous to current.
+
+    Boids that wrapped around an edge during the step move along the short
+    way across the edge rather than back across the whole screen.
+
+    Args:
+        previous (np.ndarray): (N, 2) positions before the last step.
+        current (np.ndarray): (N, 2) positions after it.
+        alpha (float): 0 for previous, 1 for current.
+        world_size (tuple): (width, height) the positions wrap around.
+
+    Returns:
+        np.ndarray: (N, 2) interpolated positions inside the world.
+    """
+    world = np.asarray(world_size, dtype=float)
+    step = current - previous
+    step -= world * np.round(step / world)
+    return np.mod(previous + alpha * step, world)
@@ -4,9 +4,40 @@ SCREEN_HEIGHT = 800
 
 # Boid settings
 NUM_BOIDS = 100
+MAX_BOIDS = 100000  # Upper limit of the boid count input box
 MAX_SPEED = 5
 PERCEPTION_RADIUS = 50
 
+# Neighbour pairs processed at once by VectorFlock. Bounds the temporary
+# buffers of the neighbour search and the rules (roughly 100 bytes per pair)
+PAIR_CHUNK = 262144
+
+# Simulation steps per second of real time, independent of the drawing frame rate
+SIMULATION_RATE = 60
+# Seconds one batch of simulation steps may take; steps beyond it are dropped, slowing the simulation down under load
+STEP_BUDGET_SECONDS = 0.025
+
+# Predators
+PREDATOR_FEAR_RADIUS = 80  # Boids closer than this to a predator flee from it
+PREDATOR_CHASE_RADIUS = 150  # Predators chase the nearest boid within this distance
+PREDATOR_SPEED_RATIO = 1.2  # Predator top speed as a multiple of the boids' maximum speed
+FLEE_WEIGHT = 3.0  # Weight of the flee force relative to the flocking rules
+
+# Obstacles
+OBSTACLE_CELL_SIZE = 4  # Resolution of the obstacle distance field, in pixels
+OBSTACLE_MARGIN = 40  # Boids closer than this to an obstacle steer away from it
+OBSTACLE_WEIGHT = 4.0  # Weight of the avoidance force relative to the flocking rules
+OBSTACLE_RADIUS = 40  # Radius of the obstacles placed with the right mouse button
+
+# Recent samples kept per metric by metrics.Metrics
+METRICS_CAPACITY = 10000
+
+# Recorded frames queued for the trajectory writer thread before recording blocks
+RECORDER_BUFFER_BYTES = 64 * 2**20
+
+# Number of pre-rotated sprite headings used to draw the boids
+SPRITE_ROTATIONS = 72
+
 # Behavior weights
 SEPARATION_WEIGHT = 1.5
 ALIGNMENT_WEIGHT = 1.0
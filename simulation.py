@@ -0,0 +1,282 @@
+"""
+Step the flock on a background thread while the window draws and handles input.
+
+The worker owns the flock. After every batch of fixed steps it copies the
+state into one of three preallocated frames and publishes it; the renderer
+always picks up the newest published frame. Frames, metrics samples and
+commands travel through deques, whose append and popleft are atomic, so neither side ever
+takes a lock or waits for the other. NumPy releases the GIL inside its
+kernels, so most of a heavy step overlaps with event handling and drawing.
+"""
+import collections
+import sys
+import threading
+import time
+from scheduler import FixedStepScheduler
+
+
+class Frame:
+    """One published flock state. Its arrays are reused once the renderer hands it back."""
+
+    def __init__(self):
+        self.positions = None
+        self.velocities = None
+        self.previous = None  # Positions one step earlier, None after a jump
+        self.num_predators = 0  # Predator rows at the end of the arrays
+        self.world_size = None
+        self.tick = 0
+        self.time = 0.0  # perf_counter() when the frame was published
+        self.interval = 0.0  # Seconds since the frame before it was published
+
+    def __len__(self):
+        """Number of boids, not counting the predators."""
+        return len(self.positions) - self.num_predators
+
+    def alpha(self, now):
+        """How far to interpolate from previous to positions when drawing at time now."""
+        if self.interval <= 0:
+            return 1.0
+        return min((now - self.time) / self.interval, 1.0)
+
+
+class FrameBuffer:
+    """
+    Lock-free triple buffer of Frames between one writer and one reader thread.
+
+    At any time the writer fills at most one frame, at most one waits in
+    ready and the reader holds at most one (two for an instant while it
+    swaps), so three frames always leave the writer a free one. An unread
+    frame is taken back by the writer when it publishes a newer one, so the
+    reader never sees a stale state and the writer never waits.
+    """
+
+    def __init__(self):
+        self._free = collections.deque(Frame() for _ in range(3))
+        self._ready = collections.deque()
+        self._held = None
+
+    def acquire(self):
+        """Writer: take a frame to fill."""
+        return self._free.popleft()
+
+    def publish(self, frame):
+        """Writer: make a filled frame the newest one."""
+        try:
+            self._free.append(self._ready.popleft())  # Never read, superseded
+        except IndexError:
+            pass
+        self._ready.append(frame)
+
+    def latest(self):
+        """
+        Reader: return the newest published frame.
+
+        Returns:
+            tuple: (frame, True if it was not returned before). frame is None
+                until the first one is published.
+        """
+        try:
+            frame = self._ready.popleft()
+        except IndexError:
+            return self._held, False
+        if self._held is not None:
+            self._free.append(self._held)
+        self._held = frame
+        return frame, True
+
+
+class SimulationThread:
+    """
+    Runs the rules of a flock on a background thread at a fixed timestep.
+
+    The other thread must not touch the flock after start(): changes go
+    through set_parameters, resize, set_predators, set_obstacles,
+    replace_flock, set_world_size and the speed methods, which queue
+    commands the worker applies between steps, and the state is read from
+    latest(). Metrics are sampled and trajectories recorded on the worker
+    after every step; the samples are read from new_samples().
+    """
+
+    def __init__(self, flock, parameters, metrics=None, recorder=None, speed=1.0):
+        """
+        Args:
+            flock (VectorFlock): The flock to step, owned by the worker from now on.
+            parameters (dict): apply_rules arguments: separation, alignment,
+                cohesion, perception_radius and max_speed.
+            metrics (Metrics): Optional metrics, stepped after every simulation step.
+            recorder (TrajectoryRecorder): Optional recorder of every step. It is
+                closed and dropped when the boid count or world size changes.
+            speed (float): Simulated time per real time.
+        """
+        self.flock = flock
+        self.parameters = dict(parameters)
+        self.metrics = metrics
+        self.recorder = recorder
+        self.scheduler = FixedStepScheduler(speed=speed)
+        self.frames = FrameBuffer()
+        self.samples = collections.deque()  # Metrics samples not yet read
+        self._commands = collections.deque()
+        self._stop = threading.Event()
+        self._error = None
+        self._jumped = True  # The next frame has no previous positions to interpolate from
+        self._last_publish = None
+        self._publish(None)
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker after its current batch of steps, raising any error it hit."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._raise_error()
+
+    @property
+    def speed(self):
+        return self.scheduler.speed
+
+    def latest(self):
+        """Newest published frame and whether it is new, as FrameBuffer.latest()."""
+        self._raise_error()
+        return self.frames.latest()
+
+    def new_samples(self):
+        """Metrics samples taken since the last call, oldest first."""
+        samples = []
+        while self.samples:
+            samples.append(self.samples.popleft())
+        return samples
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _send(self, function, *args):
+        self._commands.append((function, args))
+
+    def set_parameters(self, **parameters):
+        """Change some of the apply_rules arguments from the next step on."""
+        self._send(self.parameters.update, parameters)
+
+    def resize(self, num_boids):
+        self._send(self._resize, num_boids)
+
+    def set_predators(self, num_predators):
+        self._send(self._set_predators, num_predators)
+
+    def set_obstacles(self, field):
+        """Avoid the obstacles of field, an ObstacleField the caller no longer changes."""
+        self._send(self._set_obstacles, field)
+
+    def replace_flock(self, flock):
+        """Continue with a different flock, e.g. a freshly reset one."""
+        self._send(self._replace_flock, flock)
+
+    def set_world_size(self, width, height):
+        self._send(self._set_world_size, width, height)
+
+    def faster(self):
+        self._send(self.scheduler.faster)
+
+    def slower(self):
+        self._send(self.scheduler.slower)
+
+    def _resize(self, num_boids):
+        self.flock.resize(num_boids)
+        self._jumped = True
+
+    def _set_predators(self, num_predators):
+        self.flock.set_predators(num_predators)
+        self._jumped = True
+
+    def _set_obstacles(self, field):
+        self.flock.set_obstacles(field)
+
+    def _replace_flock(self, flock):
+        self.flock = flock
+        self.scheduler.reset()  # Time owed to the old flock is not spent on the new one
+        self._jumped = True
+
+    def _set_world_size(self, width, height):
+        self.flock.set_world_size(width, height)
+        self._jumped = True
+
+    def _run(self):
+        try:
+            last = time.perf_counter()
+            while not self._stop.is_set():
+                while self._commands:
+                    function, args = self._commands.popleft()
+                    function(*args)
+                now = time.perf_counter()
+                steps = self.scheduler.advance(now - last)
+                last = now
+                if steps == 0:
+                    time.sleep(self.scheduler.until_next_step())
+                    continue
+                self._step(steps)
+        except Exception as error:
+            self._error = error
+
+    def _step(self, steps):
+        flock = self.flock
+        parameters = self.parameters
+        start = time.perf_counter()
+        previous = None
+        for step in range(steps):
+            if step == steps - 1 and not self._jumped:
+                previous = flock.positions.copy()
+            flock.apply_rules(parameters["separation"], parameters["alignment"], parameters["cohesion"],
+                              parameters["perception_radius"], parameters["max_speed"])
+            flock.update(parameters["max_speed"])
+            self._record()
+            self._sample()
+        self.scheduler.measure(steps, time.perf_counter() - start)
+        self._publish(previous)
+
+    def _sample(self):
+        metrics = self.metrics
+        flock = self.flock
+        if metrics is None or len(flock) == 0:
+            return
+        with flock.profiler.scope("statistics"):
+            # The flock caches the neighbour sets, so the next apply_rules reuses them
+            sample = metrics.step(flock, self.parameters["perception_radius"])
+        if sample is not None:
+            self.samples.append(sample)
+
+    def _record(self):
+        recorder = self.recorder
+        if recorder is None:
+            return
+        flock = self.flock
+        if (len(flock), (flock.screen_width, flock.screen_height)) != (recorder.num_boids, recorder.world_size):
+            # The file holds a fixed number of boids in a fixed world
+            recorder.close()
+            self.recorder = None
+            print("Recording stopped: the boid count or window size changed", file=sys.stderr)
+        else:
+            with flock.profiler.scope("record"):
+                recorder.record(flock)
+
+    def _publish(self, previous):
+        flock = self.flock
+        frame = self.frames.acquire()
+        if frame.positions is None or frame.positions.shape != flock.positions.shape:
+            frame.positions = flock.positions.copy()
+            frame.velocities = flock.velocities.copy()
+        else:
+            frame.positions[:] = flock.positions
+            frame.velocities[:] = flock.velocities
+        frame.previous = previous
+        frame.num_predators = flock.num_predators
+        frame.world_size = (flock.screen_width, flock.screen_height)
+        frame.tick = flock.tick
+        now = time.perf_counter()
+        frame.interval = 0.0 if self._last_publish is None else now - self._last_publish
+        frame.time = self._last_publish = now
+        self._jumped = False
+        self.frames.publish(frame)
@@ -0,0 +1,210 @@
+import numpy as np
+from settings import PAIR_CHUNK
+
+
+def pair_offsets(positions, i, j, world_size=None):
+    """
+    Offsets from boid i to boid j for every pair.
+
+    Args:
+        positions (np.ndarray): (N, 2) positions.
+        i (np.ndarray): Indices of the boids the offsets start from.
+        j (np.ndarray): Indices of the boids the offsets point to.
+        world_size (tuple): (width, height) of a toroidal world. When given, the
+            shortest offset across the wrapped edges is used.
+
+    Returns:
+        np.ndarray: (len(i), 2) offsets.
+    """
+    offsets = positions[j] - positions[i]
+    if world_size is not None:
+        world = np.asarray(world_size, dtype=float)
+        offsets -= world * np.round(offsets / world)
+    return offsets
+
+
+def chunk_bounds(offsets, chunk_size):
+    """
+    Split items into consecutive ranges holding about chunk_size entries each.
+
+    Args:
+        offsets (np.ndarray): Non-decreasing start offsets of every item plus the
+            total at the end, like NeighbourSets.indptr.
+        chunk_size (int): Target number of entries per range. A single item with
+            more entries still gets a range of its own.
+
+    Returns:
+        list: (start, stop) item ranges covering every item.
+    """
+    n = len(offsets) - 1
+    targets = np.arange(chunk_size, offsets[-1], chunk_size)
+    cuts = np.unique(np.concatenate(([0], np.searchsorted(offsets, targets), [n])))
+    return list(zip(cuts[:-1].tolist(), cuts[1:].tolist()))
+
+
+def _stencil(cells):
+    """Distinct cell offsets of a 3-wide neighbourhood along an axis with this many cells."""
+    if cells >= 3:
+        return (-1, 0, 1)
+    if cells == 2:
+        return (0, 1)
+    return (0,)
+
+
+class SpatialGrid:
+    """
+    Uniform grid over the screen for fixed-radius neighbour queries.
+
+    The screen is split into cells at least cell_size wide, so every boid
+    within cell_size of a point lies in the 3x3 block of cells around it.
+    The block wraps around the screen edges like Boid.limits does.
+    """
+
+    def __init__(self, width, height, cell_size):
+        self.width = None
+        self.height = None
+        self.cell_size = None
+        self.configure(width, height, cell_size)
+        self.members = np.empty(0, dtype=np.intp)
+        self.cell_start = np.zeros(self.cols * self.rows + 1, dtype=np.intp)
+
+    def configure(self, width, height, cell_size):
+        """Update the world size and cell size. Cheap when nothing changed."""
+        if (width, height, cell_size) == (self.width, self.height, self.cell_size):
+            return
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.cols = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.cols
+        self.cell_height = height / self.rows
+
+    def _cell_coords(self, points):
+        cols = (points[:, 0] // self.cell_width).astype(np.intp)
+        rows = (points[:, 1] // self.cell_height).astype(np.intp)
+        # Positions may sit exactly on the far edge after float wrapping
+        np.clip(cols, 0, self.cols - 1, out=cols)
+        np.clip(rows, 0, self.rows - 1, out=rows)
+        return rows, cols
+
+    def rebuild(self, positions, index=None):
+        """
+        Bucket boids into cells.
+
+        Args:
+            positions (np.ndarray): (N, 2) positions inside the world.
+            index (np.ndarray): Optional subset of boids to insert. By default
+                every boid is inserted.
+        """
+        if index is None:
+            index = np.arange(len(positions))
+        rows, cols = self._cell_coords(positions[index])
+        cells = rows * self.cols + cols
+        order = np.argsort(cells, kind="stable")
+        self.members = index[order]
+        counts = np.bincount(cells, minlength=self.rows * self.cols)
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+
+    def _stencil_cells(self, points):
+        """Return the (len(points), 3x3) block of cells around every point."""
+        rows, cols = self._cell_coords(points)
+        return np.stack([
+            ((rows + d_row) % self.rows) * self.cols + (cols + d_col) % self.cols
+            for d_row in _stencil(self.rows)
+            for d_col in _stencil(self.cols)
+        ], axis=1)
+
+    def _expand(self, queries, cells):
+        """Pair every query with every member of its row of stencil cells."""
+        flat_cells = cells.ravel()
+        starts = self.cell_start[flat_cells]
+        counts = self.cell_start[flat_cells + 1] - starts
+        total = counts.sum()
+        # Expand each (query, cell) into one entry per member of the cell
+        slot = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        i = np.repeat(queries, counts.reshape(len(queries), -1).sum(axis=1))
+        j = self.members[np.repeat(starts, counts) + slot]
+        return i, j
+
+    def candidate_pairs(self, positions, queries=None):
+        """
+        Pair every query boid with every boid in its 3x3 block of cells.
+
+        Pairs are grouped by query boid, in the order of queries, so ascending
+        queries give pairs sorted by i.
+
+        Returns:
+            tuple: Index arrays (i, j), i being the query boid.
+        """
+        if queries is None:
+            queries = np.arange(len(positions))
+        return self._expand(queries, self._stencil_cells(positions[queries]))
+
+    def neighbour_pairs(self, positions, radius, periodic=False, queries=None, chunk_size=PAIR_CHUNK):
+        """
+        Find every pair (i, j), i != j, closer than radius.
+
+        Only candidates from the 3x3 block of cells are tested, so radius must
+        not exceed the cell size the grid was configured with. Queries are
+        processed in chunks of about chunk_size candidates, so the temporary
+        buffers stay the same size however many boids there are.
+
+        Args:
+            positions (np.ndarray): (N, 2) positions, the same array rebuild saw.
+            radius (float): Neighbourhood radius.
+            periodic (bool): Measure distances across the wrapped screen edges.
+            queries (np.ndarray): Optional subset of boids to find neighbours for.
+            chunk_size (int): Candidate pairs tested at once.
+
+        Returns:
+            tuple: Index arrays (i, j), grouped by i like candidate_pairs.
+        """
+        if queries is None:
+            queries = np.arange(len(positions))
+        index_dtype = np.int32 if len(positions) < 2**31 else np.intp
+        world_size = (self.width, self.height) if periodic else None
+        cells = self._stencil_cells(positions[queries])
+        per_query = (self.cell_start[cells + 1] - self.cell_start[cells]).sum(axis=1)
+        pairs_i, pairs_j = [np.empty(0, dtype=index_dtype)], [np.empty(0, dtype=index_dtype)]
+        for start, stop in chunk_bounds(np.concatenate(([0], np.cumsum(per_query))), chunk_size):
+            i, j = self._expand(queries[start:stop], cells[start:stop])
+            offsets = pair_offsets(positions, i, j, world_size)
+            close = (np.hypot(offsets[:, 0], offsets[:, 1]) < radius) & (i != j)
+            pairs_i.append(i[close].astype(index_dtype))
+            pairs_j.append(j[close].astype(index_dtype))
+        return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+class NeighbourSets:
+    """
+    Neighbour lists of a whole flock in compressed sparse row form.
+
+    The neighbours of boid k are indices[indptr[k]:indptr[k + 1]].
+    """
+
+    def __init__(self, i, j, num_boids):
+        """
+        Args:
+            i (np.ndarray): Boid of each pair, sorted ascending.
+            j (np.ndarray): Neighbour of each pair.
+            num_boids (int): Number of boids in the flock.
+        """
+        self.rows = i
+        self.indices = j
+        self.counts = np.bincount(i, minlength=num_boids)
+        self.indptr = np.concatenate(([0], np.cumsum(self.counts)))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __getitem__(self, k):
+        return self.indices[self.indptr[k]:self.indptr[k + 1]]
+
+    def pairs(self):
+        """Return index arrays (i, j), one entry per neighbour relation."""
+        return self.rows, self.indices
+
+    def chunks(self, chunk_size=PAIR_CHUNK):
+        """Split the boids into (start, stop) ranges with about chunk_size pairs each."""
+        return chunk_bounds(self.indptr, chunk_size)
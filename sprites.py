@@ -0,0 +1,96 @@
+import numpy as np
+import pygame
+from settings import SCREEN_HEIGHT, SPRITE_ROTATIONS
+
+SPRITE_PATH = "bird.png"
+
+_base_image = None  # Decoded bird.png, loaded once
+_scaled_sprites = {}  # (width, height) -> scaled sprite shared by all boids
+_atlases = {}  # (width, height, steps) -> SpriteAtlas of that sprite
+
+
+def sprite_size(screen_height):
+    """Side length of the boid sprite for a window of the given height."""
+    return 20 * screen_height / SCREEN_HEIGHT
+
+
+def get_sprite(screen_height):
+    """
+    Return the boid sprite scaled for a window of the given height.
+
+    The PNG is decoded once and every scaled size is kept, so building a
+    flock costs one dictionary lookup per boid instead of a disk read.
+
+    Args:
+        screen_height (int): Current window height.
+
+    Returns:
+        pygame.Surface: The shared sprite. Callers must not draw onto it.
+    """
+    global _base_image
+    size = int(sprite_size(screen_height))
+    key = (size, size)
+    sprite = _scaled_sprites.get(key)
+    if sprite is None:
+        if _base_image is None:
+            _base_image = pygame.image.load(SPRITE_PATH)
+        sprite = pygame.transform.scale(_base_image, key)
+        _scaled_sprites[key] = sprite
+    return sprite
+
+
+class SpriteAtlas:
+    """
+    A sprite pre-rotated at evenly spaced headings.
+
+    Rotating is one of the most expensive parts of drawing a boid, so the
+    rotations are done once and every frame only picks the closest one.
+    """
+
+    def __init__(self, sprite, steps=SPRITE_ROTATIONS):
+        """
+        Args:
+            sprite (pygame.Surface): The unrotated sprite.
+            steps (int): Number of headings, e.g. 72 for one every 5 degrees.
+        """
+        self.steps = steps
+        self.step_angle = 360 / steps
+        self.images = [pygame.transform.rotate(sprite, k * self.step_angle) for k in range(steps)]
+        if pygame.display.get_surface() is not None:
+            # Match the display pixel format so blits need no conversion
+            self.images = [image.convert_alpha() for image in self.images]
+        self.half_sizes = np.array([(image.get_width() / 2, image.get_height() / 2) for image in self.images])
+
+    def indices(self, velocities):
+        """Atlas index of every boid, for the same rotation Boid.draw applies."""
+        angles = np.degrees(np.arctan2(velocities[:, 1], velocities[:, 0]))
+        return np.rint((320 - angles) / self.step_angle).astype(np.intp) % self.steps
+
+    def draw(self, screen, positions, velocities, return_rects=False):
+        """
+        Draw one sprite centred on every position with a single blits call.
+
+        Returns:
+            list: The rectangle of every sprite when return_rects is True, else None.
+        """
+        indices = self.indices(velocities)
+        topleft = positions - self.half_sizes[indices]
+        images = self.images
+        return screen.blits([(images[k], xy) for k, xy in zip(indices.tolist(), topleft.tolist())], doreturn=return_rects)
+
+
+def get_atlas(screen_height, steps=SPRITE_ROTATIONS):
+    """Return the shared SpriteAtlas of the sprite for a window of the given height."""
+    sprite = get_sprite(screen_height)
+    key = sprite.get_size() + (steps,)
+    atlas = _atlases.get(key)
+    if atlas is None:
+        atlas = SpriteAtlas(sprite, steps)
+        _atlases[key] = atlas
+    return atlas
+
+
+def clear_sprite_cache():
+    """Forget the scaled sprites and atlases. Called when the window is resized."""
+    _scaled_sprites.clear()
+    _atlases.clear()
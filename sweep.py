@@ -0,0 +1,189 @@
+"""
+Run many headless simulations over a grid or Latin-hypercube sample of parameters.
+
+Every run's parameters, final metrics and metric time series are appended
+as one JSON line to the output file as soon as it finishes. Running the
+same sweep again skips the runs already in the file, so an interrupted
+sweep resumes where it stopped.
+
+Example:
+    python sweep.py --separation 0.5 1 1.5 --cohesion 0.5 1 --seeds 0 1 2 --output sweep.jsonl
+    python sweep.py --lhs 1000 --separation 0 3 --alignment 0 3 --cohesion 0 3 --radius 10 100
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+import numpy as np
+from headless import run_simulation
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, DEFAULTS
+
+# Sweepable run_simulation arguments, their command line flags and defaults
+PARAMETERS = {
+    "separation": ("--separation", DEFAULTS["separation"]),
+    "alignment": ("--alignment", DEFAULTS["alignment"]),
+    "cohesion": ("--cohesion", DEFAULTS["cohesion"]),
+    "max_speed": ("--max-speed", DEFAULTS["max_speed"]),
+    "perception_radius": ("--radius", DEFAULTS["perception_radius"]),
+    "num_boids": ("--boids", DEFAULTS["number_boids"]),
+}
+INTEGER_PARAMETERS = {"num_boids"}
+
+
+def grid_configs(space):
+    """
+    Every combination of the given values.
+
+    Args:
+        space (dict): Parameter name -> list of values.
+
+    Returns:
+        list: One dict of parameter values per combination.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def latin_hypercube(ranges, samples, seed=0):
+    """
+    Latin-hypercube sample of a box of parameters.
+
+    Every range is cut into samples equal strata and every stratum is hit
+    exactly once, with the strata of different parameters paired at random.
+
+    Args:
+        ranges (dict): Parameter name -> (low, high). Equal bounds fix a parameter.
+        samples (int): Number of configurations.
+        seed (int): Seed of the sampling, so a resumed sweep draws the same points.
+
+    Returns:
+        list: One dict of parameter values per sample.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        unit = (rng.permutation(samples) + rng.uniform(size=samples)) / samples
+        values = low + unit * (high - low)
+        columns[name] = np.rint(values).astype(int).tolist() if name in INTEGER_PARAMETERS else values.tolist()
+    return [{name: columns[name][k] for name in ranges} for k in range(samples)]
+
+
+def run_id(config):
+    """Stable identifier of one run, used to recognise finished runs when resuming."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _run(task):
+    """Pool worker: run one configuration and return its JSON line."""
+    identifier, config, options = task
+    result = run_simulation(**config, **options)
+    return json.dumps({"id": identifier, "config": config, "result": result})
+
+
+def finished_runs(path):
+    """
+    Read the ids of the runs already in a results file.
+
+    A line cut off by an interrupted sweep is removed, so new lines are
+    appended after the last complete one.
+    """
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "rb+") as f:
+        content = f.read()
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            f.truncate(complete)
+        for line in content[:complete].splitlines():
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def run_sweep(configs, seeds, path, processes=None, **options):
+    """
+    Run every configuration with every seed and append the results to path.
+
+    Args:
+        configs (list): Dicts of run_simulation arguments.
+        seeds (list): Seeds every configuration is run with.
+        path (str): JSON lines results file, also used to skip finished runs.
+        processes (int): Size of the process pool, defaults to the number of CPUs.
+        **options: Further run_simulation arguments shared by all runs.
+
+    Returns:
+        int: Number of runs executed now.
+    """
+    done = finished_runs(path)
+    tasks = []
+    for config in configs:
+        for seed in seeds:
+            run_config = {**config, "seed": seed}
+            identifier = run_id({**run_config, **options})
+            if identifier not in done:
+                tasks.append((identifier, run_config, options))
+    total = len(tasks)
+    print(f"{len(done)} runs already finished, {total} to go", file=sys.stderr)
+    if total == 0:
+        return 0
+
+    start = time.perf_counter()
+    with open(path, "a") as out, multiprocessing.Pool(processes) as pool:
+        for count, line in enumerate(pool.imap_unordered(_run, tasks), 1):
+            out.write(line + "\n")
+            out.flush()
+            elapsed = time.perf_counter() - start
+            print(f"[{count}/{total}] {elapsed:.0f}s elapsed, ~{elapsed / count * (total - count):.0f}s left",
+                  file=sys.stderr)
+    return total
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run headless simulations over a parameter grid or sample.")
+    for name, (flag, default) in PARAMETERS.items():
+        kind = int if name in INTEGER_PARAMETERS else float
+        parser.add_argument(flag, dest=name, type=kind, nargs="+", default=[default],
+                            help=f"Values to sweep, or LOW HIGH with --lhs (default {default}).")
+    parser.add_argument("--lhs", type=int, metavar="SAMPLES",
+                        help="Draw this many Latin-hypercube samples instead of a full grid.")
+    parser.add_argument("--sample-seed", type=int, default=0, help="Seed of the Latin-hypercube sample.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Simulation seeds every configuration is run with.")
+    parser.add_argument("--steps", type=int, default=1000, help="Simulation steps per run.")
+    parser.add_argument("--metrics-interval", type=int, default=10, metavar="K", help="Sample the metrics every K steps.")
+    parser.add_argument("--width", type=float, default=SCREEN_WIDTH, help="World width.")
+    parser.add_argument("--height", type=float, default=SCREEN_HEIGHT, help="World height.")
+    parser.add_argument("--periodic", action="store_true", help="Find neighbours across the wrapped edges.")
+    parser.add_argument("--processes", type=int, default=None, help="Parallel runs (defaults to the number of CPUs).")
+    parser.add_argument("--output", default="sweep.jsonl", help="JSON lines results file, appended to.")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    space = {name: getattr(args, name) for name in PARAMETERS}
+    if args.lhs:
+        for name, values in space.items():
+            if len(values) not in (1, 2):
+                parser.error(f"{PARAMETERS[name][0]} takes one value or LOW HIGH with --lhs")
+        configs = latin_hypercube({name: (values[0], values[-1]) for name, values in space.items()},
+                                  args.lhs, args.sample_seed)
+    else:
+        configs = grid_configs(space)
+
+    run_sweep(configs, args.seeds, args.output, processes=args.processes, steps=args.steps,
+              metrics_interval=args.metrics_interval, width=args.width, height=args.height, periodic=args.periodic)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
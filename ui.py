@@ -1,13 +1,18 @@
 import pygame
 import numpy as np
-from settings import SCREEN_WIDTH, SCREEN_HEIGHT, NUM_BOIDS
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, NUM_BOIDS, MAX_BOIDS
+from fonts import get_font, render_text
 import time
 class Panel:
     def __init__(self, x, y, width, height, color=(0, 0, 150), border_color=(255, 0, 0), border_width=6):
-        self.rect = pygame.Rect(x, y, width, height)
         self.color = color
         self.border_color = border_color
         self.border_width = border_width
+        self.reposition(x, y, width, height)
+
+    def reposition(self, x, y, width, height):
+        """Move and resize the panel, e.g. after the window was resized."""
+        self.rect = pygame.Rect(x, y, width, height)
         self.height = height
         self.width = width
         self.x=x
@@ -18,20 +23,53 @@ class Panel:
         pygame.draw.rect(screen, self.color, self.rect)
         pygame.draw.rect(screen, self.border_color, self.rect, self.border_width)
 
+    def render(self, screen):
+        self.Render(screen)
+
+
+class StaticLayer:
+    def __init__(self, rect, widgets):
+        """
+        Widgets that look the same every frame, pre-rendered onto one surface.
+
+        The widgets are drawn once and then composited with a single blit, so
+        a static panel full of labels costs the same as one image.
+
+        Args:
+            rect (pygame.Rect): Screen area covered by the layer.
+            widgets (list): Objects with a render(screen) method, drawn in order.
+        """
+        self.rect = pygame.Rect(rect)
+        self.widgets = widgets
+        self.surface = None
+
+    def rebuild(self):
+        """Redraw the widgets onto the layer surface. Needed after the layout changed."""
+        # Full window size, so widgets can draw at their usual screen coordinates
+        self.surface = pygame.Surface((self.rect.right, self.rect.bottom))
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+        for widget in self.widgets:
+            widget.render(self.surface)
+
+    def reposition(self, rect):
+        """Cover a new screen area. The widgets are redrawn on the next render."""
+        self.rect = pygame.Rect(rect)
+        self.surface = None
+
+    def render(self, screen):
+        if self.surface is None:
+            self.rebuild()
+        screen.blit(self.surface, self.rect.topleft, self.rect)
+
 
 
 class DigitInputBox:
     def __init__(self, x, y, width, height, initial_value=1.00, min_value=0.00, max_value=9.99, step=0.5, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.x=x
-        self.y=y
-        self.width=width
-        self.height=height
         self.value = initial_value
         self.min_value = min_value
         self.max_value = max_value
         self.step = step
-        self.font = pygame.font.Font('freesansbold.ttf', int(20*screen_height/SCREEN_HEIGHT))
         self.color = (170, 170, 170)
         self.text_color = (0, 0, 0)
         self.active = False
@@ -41,16 +79,27 @@ class DigitInputBox:
         self.cursor_visible = True
         self.last_blink_time = time.time()
         self.cursor_blink_interval = 0.5  # Cursor blinks every 0.5 seconds
-    
-        # Arrow buttons
-        self.up_arrow = pygame.Rect(x + width + 5, y, height, height // 2)
-        self.down_arrow = pygame.Rect(x + width + 5, y + height // 2, height, height // 2)
 
         # Tooltip
         self.show_tooltip = False
-        self.tooltip_font = pygame.font.Font('freesansbold.ttf', int(18* screen_height/SCREEN_HEIGHT))
         self.tooltip_text = f"Click to type values between {min_value} and {max_value}"
 
+        self.reposition(x, y, width, height, screen_width, screen_height)
+
+    def reposition(self, x, y, width, height, screen_width, screen_height):
+        """Move and resize the box for a new window size, keeping its value."""
+        self.rect = pygame.Rect(x, y, width, height)
+        self.x=x
+        self.y=y
+        self.width=width
+        self.height=height
+        self.font = get_font('freesansbold.ttf', int(20*screen_height/SCREEN_HEIGHT))
+
+        # Arrow buttons
+        self.up_arrow = pygame.Rect(x + width + 5, y, height, height // 2)
+        self.down_arrow = pygame.Rect(x + width + 5, y + height // 2, height, height // 2)
+
+        self.tooltip_font = get_font('freesansbold.ttf', int(18* screen_height/SCREEN_HEIGHT))
         self.screen_width = screen_width
         self.screen_height = screen_height
         
@@ -112,7 +161,7 @@ class DigitInputBox:
             self.last_blink_time = current_time
 
         # Render the text
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.font, self.text, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
@@ -138,7 +187,7 @@ class DigitInputBox:
 
         # Render tooltip if hovering
         if self.show_tooltip:
-            tooltip_surface = self.tooltip_font.render(self.tooltip_text, True, (0, 0, 0))
+            tooltip_surface = render_text(self.tooltip_font, self.tooltip_text, (0, 0, 0))
             tooltip_bg = tooltip_surface.get_rect(topleft=(3.3*self.screen_width/5, 0.15*self.screen_height))
             pygame.draw.rect(screen, (255, 255, 255), tooltip_bg.inflate(10, 5))  # Background with padding
             screen.blit(tooltip_surface, tooltip_bg)
@@ -160,10 +209,22 @@ class TextUI:
             font_name (str): Font name (use a system font or a .ttf file).
         """
         self.text = text
+        self.color = color
+        self.font_name = font_name
+        self.reposition(x, y, font_size)
+
+    def reposition(self, x, y, font_size):
+        """
+        Move the label and change its font size, e.g. after the window was resized.
+
+        Args:
+            x (int): New x-coordinate of the text position.
+            y (int): New y-coordinate of the text position.
+            font_size (int): New font size of the text.
+        """
         self.position = (x, y)
         self.font_size = font_size
-        self.color = color
-        self.font = pygame.font.Font(font_name, font_size)
+        self.font = get_font(self.font_name, font_size)
 
     def set_text(self, text):
         """
@@ -181,7 +242,7 @@ class TextUI:
         Args:
             screen (pygame.Surface): The surface to draw the text on.
         """
-        text_surface = self.font.render(self.text, True, self.color)
+        text_surface = render_text(self.font, self.text, self.color)
         screen.blit(text_surface, self.position)
 
 
@@ -199,34 +260,39 @@ class SemiCirclePanel:
             subtext (str): Subtext displayed below the main text.
             text_color (tuple): RGB color of the text.
         """
-        self.x = x
-        self.y = y
-        self.radius = radius
         self.color = color
         self.text = text
         self.subtext = subtext
         self.text_color = text_color
+        self.reposition(x, y, radius, screen_height)
+
+    def reposition(self, x, y, radius, screen_height):
+        """Move and resize the semicircle for a new window size."""
+        self.x = x
+        self.y = y
+        self.radius = radius
         self.screen_height=screen_height
 
     def render(self, screen):
-        """Draw the semicircle panel and its labels."""
+        """Draw the semicircle panel and its labels and return the rectangle they cover."""
         # Draw the semicircle
         rect = pygame.Rect(self.x - self.radius, self.y, 2 * self.radius, self.radius)
-        pygame.draw.circle(screen, self.color, (self.x, self.y), self.radius)  
+        circle_rect = pygame.draw.circle(screen, self.color, (self.x, self.y), self.radius)  
 
         # Fonts
-        font_main = pygame.font.Font('freesansbold.ttf', int(30* self.screen_height/SCREEN_HEIGHT))
-        font_subtext = pygame.font.Font('freesansbold.ttf', int(16* self.screen_height/SCREEN_HEIGHT))
+        font_main = get_font('freesansbold.ttf', int(30* self.screen_height/SCREEN_HEIGHT))
+        font_subtext = get_font('freesansbold.ttf', int(16* self.screen_height/SCREEN_HEIGHT))
 
         # Render main text
-        text_surface = font_main.render(self.text, True, self.text_color)
+        text_surface = render_text(font_main, self.text, self.text_color)
         text_rect = text_surface.get_rect(center=(self.x, self.y + self.radius // 3))
         screen.blit(text_surface, text_rect)
 
         # Render subtext
-        subtext_surface = font_subtext.render(self.subtext, True, self.text_color)
+        subtext_surface = render_text(font_subtext, self.subtext, self.text_color)
         subtext_rect = subtext_surface.get_rect(center=(self.x, self.y + self.radius // 2))
         screen.blit(subtext_surface, subtext_rect)
+        return circle_rect.union(text_rect).union(subtext_rect)
 
     def is_clicked(self, mouse_pos):
         """
@@ -243,29 +309,32 @@ class SemiCirclePanel:
 
 class Button:
     def __init__(self, x, y, width, height, text, font_size=20, color=(200, 200, 200), text_color=(0, 0, 0), screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT, tooltip_text = "Text"):
-        self.rect = pygame.Rect(x, y, width, height)
         self.text = text
-        self.font = pygame.font.Font(None, font_size)
         self.color = color
         self.text_color = text_color
-
-        self.screen_width = screen_width
-        self.screen_height = screen_height
         self.tooltip_text = tooltip_text
 
         # Tooltip
         self.show_tooltip = False
-        self.tooltip_font = pygame.font.Font('freesansbold.ttf', int(18* screen_height/SCREEN_HEIGHT))
+        self.reposition(x, y, width, height, font_size, screen_width, screen_height)
+
+    def reposition(self, x, y, width, height, font_size, screen_width, screen_height):
+        """Move and resize the button for a new window size."""
+        self.rect = pygame.Rect(x, y, width, height)
+        self.font = get_font(None, font_size)
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.tooltip_font = get_font('freesansbold.ttf', int(18* screen_height/SCREEN_HEIGHT))
 
     def render(self, screen):
         pygame.draw.rect(screen, self.color, self.rect)
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.font, self.text, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
         # Render tooltip if hovering
         if self.show_tooltip:
-            tooltip_surface = self.tooltip_font.render(self.tooltip_text, True, (0, 0, 0))
+            tooltip_surface = render_text(self.tooltip_font, self.tooltip_text, (0, 0, 0))
             tooltip_bg = tooltip_surface.get_rect(topleft=(3.3*self.screen_width/5, 0.15*self.screen_height))
             pygame.draw.rect(screen, (255, 255, 255), tooltip_bg.inflate(10, 5))  # Background with padding
             screen.blit(tooltip_surface, tooltip_bg)
@@ -283,17 +352,11 @@ import time
 
 
 class IntegerInputBox:
-    def __init__(self, x, y, width, height, initial_value=100, min_value=1, max_value=300, step=1, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
+    def __init__(self, x, y, width, height, initial_value=100, min_value=1, max_value=MAX_BOIDS, step=1, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
         self.value = initial_value
         self.min_value = min_value
         self.max_value = max_value
         self.step = step
-        self.font = pygame.font.Font('freesansbold.ttf', int(20* screen_height/SCREEN_HEIGHT))
         self.color = (170, 170, 170)
         self.text_color = (0, 0, 0)
         self.active = False
@@ -303,15 +366,26 @@ class IntegerInputBox:
         self.last_blink_time = time.time()
         self.cursor_blink_interval = 0.5  # Cursor blinks every 0.5 seconds
 
-        # Arrow buttons
-        self.up_arrow = pygame.Rect(x + width + 5, y, height, height // 2)
-        self.down_arrow = pygame.Rect(x + width + 5, y + height // 2, height, height // 2)
-
         # Tooltip
         self.show_tooltip = False
-        self.tooltip_font = pygame.font.Font('freesansbold.ttf', int(18*screen_height/SCREEN_HEIGHT))
         self.tooltip_text = f"Enter an integer between {min_value} and {max_value}"
 
+        self.reposition(x, y, width, height, screen_width, screen_height)
+
+    def reposition(self, x, y, width, height, screen_width, screen_height):
+        """Move and resize the box for a new window size, keeping its value."""
+        self.rect = pygame.Rect(x, y, width, height)
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.font = get_font('freesansbold.ttf', int(20* screen_height/SCREEN_HEIGHT))
+
+        # Arrow buttons
+        self.up_arrow = pygame.Rect(x + width + 5, y, height, height // 2)
+        self.down_arrow = pygame.Rect(x + width + 5, y + height // 2, height, height // 2)
+
+        self.tooltip_font = get_font('freesansbold.ttf', int(18*screen_height/SCREEN_HEIGHT))
         self.screen_width = screen_width
         self.screen_height=screen_height
 
@@ -357,7 +431,7 @@ class IntegerInputBox:
             self.last_blink_time = current_time
 
         # Render the text
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.font, self.text, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
@@ -382,7 +456,7 @@ class IntegerInputBox:
 
         # Render tooltip if hovering
         if self.show_tooltip:
-            tooltip_surface = self.tooltip_font.render(self.tooltip_text, True, (0, 0, 0))
+            tooltip_surface = render_text(self.tooltip_font, self.tooltip_text, (0, 0, 0))
             tooltip_bg = tooltip_surface.get_rect(topleft=(3.3*self.screen_width/5, 0.15*self.screen_height))
             pygame.draw.rect(screen, (255, 255, 255), tooltip_bg.inflate(10, 5))  # Background with padding
             screen.blit(tooltip_surface, tooltip_bg)